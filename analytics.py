@@ -0,0 +1,123 @@
+"""
+Vectorized roster analytics: per-group summaries of the numeric athlete columns
+"""
+import math
+import warnings
+from typing import Dict, List, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import TTLCache
+from config import settings
+from models import Athlete
+
+# Numeric columns that can be summarized, by public name
+ANALYTICS_METRICS = {
+    "body_weight": Athlete.body_weight,
+    "height": Athlete.Height,
+    "bmr": Athlete.bmr,
+    "hydration_level": Athlete.hydration_level,
+    "muscle_mass": Athlete.muscle_mass,
+    "age": Athlete.age,
+}
+ANALYTICS_GROUPS = {
+    "sports_playing": Athlete.sports_playing,
+    "position": Athlete.position,
+}
+PERCENTILES = (10, 25, 50, 75, 90)
+OUTLIER_IQR_FACTOR = 1.5
+
+# Results per (trainer, query, roster fingerprint); cleared on every athlete write in
+# this worker, and missed after one in another, since the fingerprint changes with it
+analytics_cache = TTLCache(maxsize=256, ttl=settings.ANALYTICS_CACHE_TTL_SECONDS)
+
+
+def invalidate_analytics() -> None:
+    analytics_cache.clear()
+
+
+def _number(value):
+    return None if value is None or math.isnan(value) else round(float(value), 3)
+
+
+# Summaries for every group of rows (id, *group values, *metric values)
+def summarize_roster(rows: Sequence[tuple], group_by: List[str], metrics: List[str], below: Dict[str, float]) -> List[dict]:
+    if not rows:
+        return []
+    # numpy is only loaded once someone asks for analytics
+    import numpy as np
+
+    group_width = len(group_by)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    values = np.array([row[1 + group_width:] for row in rows], dtype=float).reshape(len(rows), len(metrics))
+
+    # Integer code per distinct group, then sort so each group is one contiguous block
+    group_index: Dict[tuple, int] = {}
+    codes = np.fromiter(
+        (group_index.setdefault(tuple(row[1:1 + group_width]), len(group_index)) for row in rows),
+        dtype=np.int64, count=len(rows),
+    )
+    order = np.argsort(codes, kind="stable")
+    codes, ids, values = codes[order], ids[order], values[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+    group_keys = {code: key for key, code in group_index.items()}
+
+    below_columns = [(name, metrics.index(name), limit) for name, limit in below.items()]
+    groups = []
+    with warnings.catch_warnings():
+        # All-missing columns legitimately produce NaN summaries
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for start, end in zip(starts, np.append(starts[1:], len(codes))):
+            block, block_ids = values[start:end], ids[start:end]
+            counts = np.count_nonzero(~np.isnan(block), axis=0)
+            means = np.nanmean(block, axis=0)
+            stds = np.nanstd(block, axis=0, ddof=1)
+            mins, maxs = np.nanmin(block, axis=0), np.nanmax(block, axis=0)
+            quantiles = np.nanpercentile(block, PERCENTILES, axis=0)
+            q1, q3 = np.nanpercentile(block, (25, 75), axis=0)
+            iqr = q3 - q1
+            outlier_mask = (block < q1 - OUTLIER_IQR_FACTOR * iqr) | (block > q3 + OUTLIER_IQR_FACTOR * iqr)
+
+            summary = {}
+            for column, name in enumerate(metrics):
+                summary[name] = {
+                    "count": int(counts[column]),
+                    "mean": _number(means[column]),
+                    "std": _number(stds[column]) if counts[column] > 1 else None,
+                    "min": _number(mins[column]),
+                    **{f"p{pct}": _number(quantiles[i, column]) for i, pct in enumerate(PERCENTILES)},
+                    "max": _number(maxs[column]),
+                    "outliers": block_ids[outlier_mask[:, column]].tolist(),
+                }
+
+            groups.append({
+                "group": dict(zip(group_by, group_keys[int(codes[start])])),
+                "count": int(end - start),
+                "metrics": summary,
+                "below": {name: block_ids[block[:, column] < limit].tolist() for name, column, limit in below_columns},
+            })
+    return groups
+
+
+# Every athlete write bumps its row version, so the sum moves with any edit to the roster;
+# the count and the sum of ids catch athletes joining, leaving or being deleted
+async def roster_fingerprint(db: AsyncSession, trainer_id: int) -> tuple:
+    row = (await db.execute(
+        select(func.count(), func.sum(Athlete.version), func.sum(Athlete.id)).where(Athlete.trainer_id == trainer_id)
+    )).one()
+    return tuple(row)
+
+
+# Load only the id, grouping and numeric columns of a trainer's roster and summarize them
+async def roster_analytics(db: AsyncSession, trainer_id: int, group_by: List[str], metrics: List[str], below: Dict[str, float]) -> List[dict]:
+    key = (trainer_id, tuple(group_by), tuple(metrics), tuple(sorted(below.items())), await roster_fingerprint(db, trainer_id))
+    cached = analytics_cache.get(key)
+    if cached is not None:
+        return cached
+
+    columns = [Athlete.id] + [ANALYTICS_GROUPS[name] for name in group_by] + [ANALYTICS_METRICS[name] for name in metrics]
+    rows = (await db.execute(select(*columns).where(Athlete.trainer_id == trainer_id))).all()
+    groups = summarize_roster(rows, group_by, metrics, below)
+    analytics_cache.set(key, groups)
+    return groups
@@ -2,23 +2,78 @@
 Initializes and configures the FastAPI application
 Sets up the app instance and integrates components like and database connections
 """
-from fastapi import FastAPI
-from db import engine, Base
-from controller import router as api_router
+import logging
+import math
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from db import engine, async_engine
+from controller import router as api_router, streaming_environment, templates
 from fastapi.staticfiles import StaticFiles
-from models import Athlete, Trainer
+from metrics import MetricsMiddleware, instrument_engine
+from migrations import check_schema, migrate
+from assets import ASSET_URL_PREFIX, AssetFiles, build_assets, load_manifest
+from templating import warm_templates
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Work done once per worker before it serves, kept out of import time
+def prepare_worker() -> None:
+    # Schema changes normally run once per deploy, through `python migrations.py`
+    if settings.MIGRATE_ON_STARTUP:
+        migrate()
+    else:
+        check_schema()
+
+    # Fingerprinted, resized and precompressed copies of static/, cached by clients for good
+    if settings.ASSET_BUILD_ON_STARTUP:
+        build_assets()
+    load_manifest()
+
+    # Compile every template now (or load it from the bytecode cache) rather than on a first request
+    warm_templates(templates.env, streaming_environment)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(prepare_worker)
+    logger.info("Worker ready.")
+    yield
+
 
 # Initialize FastAPI app
-StatSync = FastAPI()
+StatSync = FastAPI(lifespan=lifespan)
+
+
+# NaN and infinity, as rejected inputs, spelled out so the error stays valid JSON
+def _json_safe(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_safe(item) for item in value]
+    return value
+
+
+# The default handler echoes each rejected input, and fails to encode a non-finite number
+@StatSync.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    return JSONResponse(status_code=422, content={"detail": _json_safe(jsonable_encoder(exc.errors()))})
 
 # Mount the static directory for serving static files
 StatSync.mount("/static", StaticFiles(directory="static"), name="static")
+StatSync.mount(ASSET_URL_PREFIX, AssetFiles(directory=settings.ASSET_BUILD_DIR, check_dir=False), name="assets")
 
 # Include the API router with the routes
 StatSync.include_router(api_router)
 
-
-# Create the database tables
-Base.metadata.create_all(bind=engine)
-
-print("Database and tables created successfully.")
+# Per-route latency and database query metrics, served at /metrics
+StatSync.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
@@ -0,0 +1,264 @@
+"""
+Static asset pipeline: fingerprinted names, responsive image variants and gzip copies
+
+Build with `python assets.py`, or let the app build at startup, where workers
+starting together may all build at once; sources whose fingerprint is already
+in the manifest are skipped, so a rebuild only touches what changed. Templates resolve URLs through asset_url and friends.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import stat
+import time
+from typing import Dict, List, Optional
+
+import anyio
+from markupsafe import Markup
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+ASSET_URL_PREFIX = "/assets"
+SOURCE_URL_PREFIX = "/static"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Worth precompressing; images are already compressed
+TEXT_EXTENSIONS = {".css", ".js", ".mjs", ".svg", ".json", ".txt", ".html", ".map", ".xml"}
+FALLBACK_EXTENSIONS = {"jpeg": "jpg", "png": "png"}
+
+# Source path (relative to the source directory) -> built entry
+manifest: Dict[str, dict] = {}
+
+
+def _build_options() -> dict:
+    return {
+        "widths": sorted(settings.ASSET_IMAGE_WIDTHS),
+        "webp_quality": settings.ASSET_WEBP_QUALITY,
+        "jpeg_quality": settings.ASSET_JPEG_QUALITY,
+    }
+
+
+# Content hash of the source plus the options it is built with
+def fingerprint(data: bytes, options: dict) -> str:
+    digest = hashlib.sha256(data)
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()[:12]
+
+
+# Every output is written under a name unique to this process, then renamed into place:
+# workers building at startup at the same time never share a partial file, and a
+# reader sees either no file or a complete one
+def _partial_path(target: str) -> str:
+    return f"{target}.{os.getpid()}.tmp"
+
+
+def _save_atomically(image, target: str, *args, **options) -> None:
+    partial = _partial_path(target)
+    image.save(partial, *args, **options)
+    os.replace(partial, target)
+
+
+def _write_atomically(target: str, data: bytes) -> None:
+    partial = _partial_path(target)
+    with open(partial, "wb") as output:
+        output.write(data)
+    os.replace(partial, target)
+
+
+def _has_alpha(image) -> bool:
+    return image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+
+
+# WebP plus a JPEG (or PNG, for transparent images) at each configured width up to the original
+def _build_image(image, stem: str, digest: str, output_dir: str, options: dict) -> dict:
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    fallback = "png" if _has_alpha(image) else "jpeg"
+    image = image.convert("RGBA" if fallback == "png" else "RGB")
+
+    widths = sorted({width for width in options["widths"] if width < image.width} | {image.width})
+    variants = []
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        variant = {"width": width, "height": height}
+        for fmt in ("webp", fallback):
+            name = f"{stem}.{digest}.{width}w.{FALLBACK_EXTENSIONS.get(fmt, fmt)}"
+            path = os.path.join(output_dir, name)
+            if fmt == "webp":
+                _save_atomically(resized, path, "WEBP", quality=options["webp_quality"], method=6)
+            elif fmt == "jpeg":
+                _save_atomically(resized, path, "JPEG", quality=options["jpeg_quality"], optimize=True, progressive=True)
+            else:
+                _save_atomically(resized, path, "PNG", optimize=True)
+            variant[fmt] = name
+        variants.append(variant)
+    return {"kind": "image", "fallback": fallback, "width": image.width, "height": image.height, "variants": variants}
+
+
+# Fingerprinted copy, plus a gzip copy for text when it is smaller
+def _build_file(data: bytes, stem: str, extension: str, digest: str, output_dir: str) -> dict:
+    name = f"{stem}.{digest}{extension}"
+    _write_atomically(os.path.join(output_dir, name), data)
+    entry = {"kind": "file", "file": name, "gzip": False}
+    if extension.lower() in TEXT_EXTENSIONS:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) < len(data):
+            _write_atomically(os.path.join(output_dir, name + ".gz"), compressed)
+            entry["gzip"] = True
+    return entry
+
+
+def _entry_files(entry: dict) -> List[str]:
+    if entry["kind"] == "image":
+        return [variant[fmt] for variant in entry["variants"] for fmt in ("webp", entry["fallback"])]
+    return [entry["file"]] + ([entry["file"] + ".gz"] if entry["gzip"] else [])
+
+
+def _source_files(source_dir: str, output_dir: str):
+    output_dir = os.path.abspath(output_dir)
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != output_dir)
+        for filename in sorted(files):
+            if not filename.startswith("."):
+                path = os.path.join(root, filename)
+                yield os.path.relpath(path, source_dir).replace(os.sep, "/"), path
+
+
+def read_manifest(output_dir: str) -> Dict[str, dict]:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return {}
+
+
+# Build every changed source and write the manifest; returns the manifest
+def build_assets(source_dir: Optional[str] = None, output_dir: Optional[str] = None) -> Dict[str, dict]:
+    source_dir = source_dir or settings.ASSET_SOURCE_DIR
+    output_dir = output_dir or settings.ASSET_BUILD_DIR
+    options = _build_options()
+    previous = read_manifest(output_dir)
+    built: Dict[str, dict] = {}
+    rebuilt = 0
+    started = time.perf_counter()
+
+    for relative, path in _source_files(source_dir, output_dir):
+        with open(path, "rb") as source:
+            data = source.read()
+        digest = fingerprint(data, options)
+        entry = previous.get(relative)
+        if entry and entry["fingerprint"] == digest and all(
+            os.path.exists(os.path.join(output_dir, name)) for name in _entry_files(entry)
+        ):
+            built[relative] = entry
+            continue
+
+        directory, filename = os.path.split(relative)
+        stem, extension = os.path.splitext(filename)
+        os.makedirs(os.path.join(output_dir, directory), exist_ok=True)
+        stem = f"{directory}/{stem}" if directory else stem
+        # Pillow is only loaded when something needs building, never to serve
+        from PIL import Image, UnidentifiedImageError
+
+        try:
+            with Image.open(path) as image:
+                image.load()
+                entry = _build_image(image, stem, digest, output_dir, options)
+        except UnidentifiedImageError:
+            entry = _build_file(data, stem, extension, digest, output_dir)
+        entry["fingerprint"] = digest
+        built[relative] = entry
+        rebuilt += 1
+
+    # Written last, so a crashed build never points at missing files
+    os.makedirs(output_dir, exist_ok=True)
+    _write_atomically(os.path.join(output_dir, MANIFEST_NAME), json.dumps(built, indent=1, sort_keys=True).encode())
+    logger.info("Built %d of %d static assets in %.2fs", rebuilt, len(built), time.perf_counter() - started)
+    return built
+
+
+def load_manifest(output_dir: Optional[str] = None) -> None:
+    manifest.clear()
+    manifest.update(read_manifest(output_dir or settings.ASSET_BUILD_DIR))
+
+
+def _pick_variant(entry: dict, width: Optional[int]) -> dict:
+    # Smallest variant at least as wide as asked, else the largest
+    if width is not None:
+        for variant in entry["variants"]:
+            if variant["width"] >= width:
+                return variant
+    return entry["variants"][-1]
+
+
+# URL of a built asset, falling back to the unprocessed source when it is not in the manifest
+def asset_url(path: str, width: Optional[int] = None, format: Optional[str] = None) -> str:
+    entry = manifest.get(path)
+    if entry is None:
+        return f"{SOURCE_URL_PREFIX}/{path}"
+    if entry["kind"] == "file":
+        return f"{ASSET_URL_PREFIX}/{entry['file']}"
+    return f"{ASSET_URL_PREFIX}/{_pick_variant(entry, width)[format or entry['fallback']]}"
+
+
+# srcset listing every width of an image in one format
+def asset_srcset(path: str, format: Optional[str] = None) -> str:
+    entry = manifest.get(path)
+    if entry is None or entry["kind"] != "image":
+        return asset_url(path)
+    fmt = format or entry["fallback"]
+    return ", ".join(f"{ASSET_URL_PREFIX}/{variant[fmt]} {variant['width']}w" for variant in entry["variants"])
+
+
+# CSS image-set() offering WebP with the fallback format, for background images
+def asset_image_set(path: str, width: Optional[int] = None) -> Markup:
+    entry = manifest.get(path)
+    if entry is None or entry["kind"] != "image":
+        return Markup(f"url('{asset_url(path)}')")
+    variant = _pick_variant(entry, width)
+    fallback = entry["fallback"]
+    return Markup(
+        f"image-set(url('{ASSET_URL_PREFIX}/{variant['webp']}') type('image/webp'), "
+        f"url('{ASSET_URL_PREFIX}/{variant[fallback]}') type('image/{fallback}'))"
+    )
+
+
+def install_template_helpers(environment) -> None:
+    environment.globals.update(asset_url=asset_url, asset_srcset=asset_srcset, asset_image_set=asset_image_set)
+
+
+class AssetFiles(StaticFiles):
+    """Serves the built assets: immutable caching, and the gzip copy when the client accepts it"""
+
+    async def get_response(self, path: str, scope):
+        compressible = os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS
+        if compressible and "gzip" in Headers(scope=scope).get("accept-encoding", ""):
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + ".gz")
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                response = self.file_response(full_path, stat_result, scope)
+                response.headers["Content-Encoding"] = "gzip"
+                media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                response.headers["Content-Type"] = f"{media_type}; charset=utf-8" if media_type.startswith("text/") else media_type
+                return self._cacheable(response, compressible)
+        return self._cacheable(await super().get_response(path, scope), compressible)
+
+    @staticmethod
+    def _cacheable(response, compressible: bool):
+        # Names change with content, so a copy never needs revalidating
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        if compressible:
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_assets()
@@ -1,14 +1,23 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt, ExpiredSignatureError
 from passlib.context import CryptContext
 
+from cache import TTLCache
 from db import get_db
 from models import Athlete, Trainer
 from config import settings
 
+logger = logging.getLogger(__name__)
+
 # OAuth2 token URL
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -17,8 +26,18 @@ SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Cookie holding the access token for each role
+TOKEN_COOKIES = {"athlete": "athlete_access_token", "trainer": "trainer_access_token"}
+
+# Decoded tokens mapped to (role, username, primary key), shared across requests. Only the
+# identity is kept: rows are read fresh, since another worker may have changed them
+principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+# Password hashing context; hashes below BCRYPT_ROUNDS are flagged for an upgrade
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# Bounded pool for bcrypt work so hashing never blocks the event loop
+password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 
 # Utility function to verify password
@@ -31,6 +50,18 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# Hash a password on the bcrypt pool
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
+
+# Verify a password on the bcrypt pool, returning a new hash when the stored cost is outdated
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.verify_and_update, plain_password, hashed_password)
+
+
 # Utility function to create JWT token
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -44,21 +75,30 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 
 # Utility function to authenticate user (athlete or trainer)
-def authenticate_user(db: Session, username: str, password: str, role: str):
+async def authenticate_user(db: AsyncSession, username: str, password: str, role: str):
     if role == "athlete":
-        user = db.query(Athlete).filter(Athlete.username == username).first()
+        user = await db.scalar(select(Athlete).where(Athlete.username == username))
     elif role == "trainer":
-        user = db.query(Trainer).filter(Trainer.username == username).first()
+        user = await db.scalar(select(Trainer).where(Trainer.username == username))
     else:
         raise HTTPException(status_code=400, detail="Invalid role")
     
-    if not user or not verify_password(password, user.password):
+    if not user:
         return False
+
+    valid, new_hash = await verify_and_update_password(password, user.password)
+    if not valid:
+        return False
+
+    # Rehash with the current cost factor on a successful login
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
     return user
 
 
 # Dependency to get current user based on JWT token
-async def get_current_user(request: Request, role_type: str, db: Session = Depends(get_db)):
+async def get_current_user(request: Request, role_type: str, db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -66,11 +106,10 @@ async def get_current_user(request: Request, role_type: str, db: Session = Depen
     )
     
     # Get the token from the cookies
-    token_key = "athlete_access_token" if role_type == "athlete" else "trainer_access_token"
-    token = request.cookies.get(token_key)
+    token = request.cookies.get(TOKEN_COOKIES[role_type])
 
     if not token:
-        print("No access token found in cookies.")
+        logger.debug("No %s access token found in cookies.", role_type)
         raise credentials_exception
     
     try:
@@ -81,51 +120,85 @@ async def get_current_user(request: Request, role_type: str, db: Session = Depen
         username: str = payload.get("sub")
         role: str = payload.get("role")
 
-
-        # Debugging: Print out the extracted data
-        print(f"Decoded JWT - Username: {username}, Role: {role}")
+        logger.debug("Decoded JWT - Username: %s, Role: %s", username, role)
 
         if username is None or role is None or role != role_type:
             raise credentials_exception
         return username, role
   
     except JWTError as e:
-        print(f"JWT Error: {str(e)}")
+        logger.debug("JWT Error: %s", e)
         raise credentials_exception
 
-# Dependency to get current authenticated athlete
-async def get_current_athlete(request: Request, db: Session = Depends(get_db)):
-    # Get the username and role from the athlete JWT token
-    username, role = await get_current_user(request, "athlete", db)
-
-    
-    # Ensure the user is an athlete
-    if role != "athlete":
-        raise HTTPException(status_code=403, detail="Not authorized as athlete")
+# Look up a principal through the per-request memo, then the process-wide cache of
+# verified identities (one primary key read), and only then decode the token and
+# query the database by username
+async def resolve_principal(request: Request, role_type: str, db: AsyncSession):
+    memo = getattr(request.state, "principals", None)
+    if memo is None:
+        memo = request.state.principals = {}
+    if role_type in memo:
+        return memo[role_type]
+
+    model = Athlete if role_type == "athlete" else Trainer
+    token = request.cookies.get(TOKEN_COOKIES[role_type])
+    cached = principal_cache.get(token) if token else None
+    if cached is not None:
+        principal = await db.get(model, cached[2])
+        if principal is not None:
+            memo[role_type] = principal
+            return principal
+        # Deleted by another worker
+        principal_cache.pop(token)
+
+    # Get the username and role from the JWT token
+    username, role = await get_current_user(request, role_type, db)
+
+    # Ensure the token was issued for this role
+    if role != role_type:
+        raise HTTPException(status_code=403, detail=f"Not authorized as {role_type}")
+
+    # Fetch the user from the database using the username
+    principal = await db.scalar(select(model).where(model.username == username))
+
+    if not principal:
+        raise HTTPException(status_code=404, detail=f"{role_type.capitalize()} not found")
+
+    # Never cache a principal past its token's expiry
+    ttl = None
+    expires_at = jwt.get_unverified_claims(token).get("exp")
+    if expires_at is not None:
+        ttl = max(0, expires_at - datetime.now(timezone.utc).timestamp())
+    principal_cache.set(token, (role_type, username, principal.id), ttl=ttl)
+
+    memo[role_type] = principal
+    return principal
+
+
+# Drop cached principals for users whose rows were created, changed or deleted
+def invalidate_principal(role_type: str, *usernames: str) -> None:
+    stale = set(usernames)
+    principal_cache.discard_where(lambda token, entry: entry[0] == role_type and entry[1] in stale)
 
-    # Fetch the athlete from the database using the username
-    athlete = db.query(Athlete).filter(Athlete.username == username).first()
-    
-    if not athlete:
-        raise HTTPException(status_code=404, detail="Athlete not found")
 
-    return athlete
+# Dependency to get current authenticated athlete
+async def get_current_athlete(request: Request, db: AsyncSession = Depends(get_db)):
+    return await resolve_principal(request, "athlete", db)
 
 
 # Dependency to get current authenticated trainer
-async def get_current_trainer(request: Request, db: Session = Depends(get_db)):
-    # Get username and role from JWT token
-    username, role = await get_current_user(request, "trainer", db)
+async def get_current_trainer(request: Request, db: AsyncSession = Depends(get_db)):
+    return await resolve_principal(request, "trainer", db)
 
-    # Ensure the user is a trainer
-    if role != "trainer":
-        raise HTTPException(status_code=403, detail="Not authorized as trainer")
 
-    # Fetch the trainer's data from the database
-    trainer = db.query(Trainer).filter(Trainer.username == username).first()
-    
-    if not trainer:
-        raise HTTPException(status_code=404, detail="Trainer not found")
-
-    return trainer
+# Dependency for routes open to both roles; returns (role, principal), preferring the athlete cookie
+async def get_current_principal(request: Request, db: AsyncSession = Depends(get_db)):
+    for role_type in ("athlete", "trainer"):
+        if request.cookies.get(TOKEN_COOKIES[role_type]):
+            return role_type, await resolve_principal(request, role_type, db)
 
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
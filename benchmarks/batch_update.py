@@ -0,0 +1,79 @@
+"""
+Batch athlete edits: one PATCH /athletes against a PUT /athlete/{id} per athlete
+
+Seeds one trainer's roster and applies the same weigh-in (new body weight and
+hydration level for --edits athletes) both ways through the ASGI app, one
+request and commit per athlete against one request and transaction in total.
+
+Usage: python benchmarks/batch_update.py [--roster 2000] [--edits 500] [--repeats 3]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from common import prepare_app
+
+
+def weigh_in(athlete_ids, rng):
+    return [
+        {"id": athlete_id, "fields": {"body_weight": round(rng.uniform(50, 110), 1), "hydration_level": round(rng.uniform(50, 65), 1)}}
+        for athlete_id in athlete_ids
+    ]
+
+
+async def run(args):
+    import httpx
+
+    from app import StatSync, prepare_worker
+    from auth import create_access_token
+    from db import SessionLocal
+    from synthetic import seed_database
+
+    # ASGITransport does not run the lifespan hook
+    prepare_worker()
+    with SessionLocal() as session:
+        seed_database(session, 1, args.roster, "x")
+
+    rng = random.Random(0)
+    cookie = "trainer_access_token=" + create_access_token({"sub": "trainer0", "role": "trainer"})
+    transport = httpx.ASGITransport(app=StatSync)
+    timings = {"put_per_athlete": [], "patch_batch": []}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers={"Cookie": cookie}) as client:
+        for _ in range(args.repeats):
+            athlete_ids = rng.sample(range(1, args.roster + 1), args.edits)
+
+            started = time.perf_counter()
+            for edit in weigh_in(athlete_ids, rng):
+                response = await client.put(f"/athlete/{edit['id']}", json=edit["fields"])
+                assert response.status_code == 200, response.text
+            timings["put_per_athlete"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            response = await client.patch("/athletes", json=weigh_in(athlete_ids, rng))
+            timings["patch_batch"].append(time.perf_counter() - started)
+            assert response.status_code == 200 and response.json()["updated"] == args.edits, response.text
+
+    best = {name: min(values) for name, values in timings.items()}
+    return {
+        "roster": args.roster,
+        "edits": args.edits,
+        **{name: {"total_ms": round(seconds * 1000, 1), "us_per_edit": round(seconds / args.edits * 1e6, 1)} for name, seconds in best.items()},
+        "speedup": round(best["put_per_athlete"] / best["patch_batch"], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--roster", type=int, default=2000)
+    parser.add_argument("--edits", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    prepare_app()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Helpers shared by the benchmark scripts
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Point the app at a throwaway database and make it importable; call before importing app modules
+def prepare_app(app_dir: str = APP_DIR) -> str:
+    workdir = tempfile.mkdtemp(prefix="statsync-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+    return workdir
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    if not samples:
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+    }
+
+
+def git_revision(app_dir: str = APP_DIR):
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=app_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# A projected athlete row as JSON-ready values: how GET /athletes built each row
+# before the response schemas, kept as the baseline for the serialization benchmarks
+def athlete_row_to_dict(row, field_names):
+    return {
+        name: value.isoformat() if isinstance(value, date) else value
+        for name, value in zip(field_names, row)
+    }
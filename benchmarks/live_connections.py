@@ -0,0 +1,175 @@
+"""
+Live update capacity: thousands of idle WebSocket subscribers on one uvicorn worker
+
+Seeds a throwaway database, starts the app under uvicorn in a subprocess and opens
+--connections WebSockets (as the roster's trainer) spread over --watched athletes.
+Reports the worker's memory per idle connection, then the delivery latency of the
+deltas published by trainer updates to every subscriber. A second, in-process
+section publishes to subscribers that never read, showing that coalescing keeps
+each mailbox at one pending message.
+
+Usage: python benchmarks/live_connections.py [--connections 2000] [--watched 10] [--rounds 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from common import APP_DIR, prepare_app, summarize
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+async def wait_until_up(base_url: str, timeout: float = 60.0) -> None:
+    import httpx
+
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(f"{base_url}/")
+                return
+            except httpx.TransportError:
+                if time.perf_counter() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+async def run_server_benchmark(args, cookie: str, athlete_ids, port: int, server_pid: int) -> dict:
+    import httpx
+    import websockets
+
+    base_url = f"http://127.0.0.1:{port}"
+    await wait_until_up(base_url)
+    idle_rss = rss_kib(server_pid)
+
+    received = {}
+    sockets = []
+    started = time.perf_counter()
+    for index in range(args.connections):
+        athlete_id = athlete_ids[index % len(athlete_ids)]
+        connection = await websockets.connect(
+            f"ws://127.0.0.1:{port}/ws/athlete/{athlete_id}",
+            extra_headers={"Cookie": cookie}, max_queue=None, ping_interval=None,
+        )
+        sockets.append((athlete_id, connection))
+    connect_seconds = time.perf_counter() - started
+    await asyncio.sleep(1.0)
+    connected_rss = rss_kib(server_pid)
+
+    async def listen(index, connection):
+        async for message in connection:
+            received.setdefault(json.loads(message)["version"], []).append((index, time.perf_counter()))
+
+    listeners = [asyncio.create_task(listen(i, connection)) for i, (_, connection) in enumerate(sockets)]
+    latencies = []
+    delivered = 0
+    async with httpx.AsyncClient(base_url=base_url, headers={"Cookie": cookie}) as client:
+        for round_number in range(args.rounds):
+            athlete_id = athlete_ids[round_number % len(athlete_ids)]
+            expected = sum(1 for watched, _ in sockets if watched == athlete_id)
+            received.clear()
+            sent = time.perf_counter()
+            response = await client.post(f"/trainer/athlete/{athlete_id}/update", data={
+                "first_name": "Live", "last_name": f"Round{round_number}", "email": f"athlete{athlete_id - 1}@example.com",
+                "body_weight": str(60 + round_number),
+            })
+            assert response.status_code == 302, response.status_code
+            deadline = time.perf_counter() + 30
+            while sum(len(arrivals) for arrivals in received.values()) < expected and time.perf_counter() < deadline:
+                await asyncio.sleep(0.005)
+            arrivals = [arrival for batch in received.values() for _, arrival in batch]
+            delivered += len(arrivals)
+            latencies.extend(arrival - sent for arrival in arrivals)
+
+    for listener in listeners:
+        listener.cancel()
+    await asyncio.gather(*(connection.close() for _, connection in sockets), return_exceptions=True)
+
+    per_round = args.connections // len(athlete_ids)
+    return {
+        "connections": args.connections,
+        "connect_seconds": round(connect_seconds, 2),
+        "server_rss_idle_mib": round(idle_rss / 1024, 1),
+        "server_rss_connected_mib": round(connected_rss / 1024, 1),
+        "server_kib_per_connection": round((connected_rss - idle_rss) / args.connections, 1),
+        "subscribers_per_update": per_round,
+        "delivered": delivered,
+        "expected": per_round * args.rounds,
+        "update_to_delivery": summarize(latencies),
+    }
+
+
+# Publishing into mailboxes nobody drains: cost per publish, and memory that stays flat
+def run_hub_benchmark(subscribers: int, publishes: int) -> dict:
+    from live import LiveHub
+
+    hub = LiveHub()
+    subscriptions = [hub.subscribe(1) for _ in range(subscribers)]
+    started = time.perf_counter()
+    for index in range(publishes):
+        hub.publish(1, index, {"body_weight": 60.0 + index, "bmr": 1500.0})
+    elapsed = time.perf_counter() - started
+    return {
+        "subscribers": subscribers,
+        "publishes": publishes,
+        "fanout_ms_per_publish": round(elapsed / publishes * 1000, 3),
+        "coalesced": hub.coalesced,
+        "max_pending_fields": max(len(subscription._pending) for subscription in subscriptions),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--watched", type=int, default=10, help="athletes the connections are spread over")
+    parser.add_argument("--rounds", type=int, default=5)
+    # Deltas are tiny; per-connection zlib contexts would triple idle memory
+    parser.add_argument("--uvicorn-args", default="--ws-per-message-deflate false", help="extra uvicorn options")
+    parser.add_argument("--hub-subscribers", type=int, default=10000)
+    parser.add_argument("--hub-publishes", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = prepare_app()
+    from auth import create_access_token
+    from db import Base, SessionLocal, engine
+    from synthetic import seed_database
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        seed_database(session, 1, max(args.watched, 10), "x")
+    cookie = "trainer_access_token=" + create_access_token({"sub": "trainer0", "role": "trainer"})
+    athlete_ids = list(range(1, args.watched + 1))
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:StatSync", "--port", str(port), "--log-level", "warning"] + args.uvicorn_args.split(),
+        cwd=APP_DIR, env={**os.environ, "ASSET_BUILD_DIR": os.path.join(workdir, "assets")},
+    )
+    try:
+        results = {"server": asyncio.run(run_server_benchmark(args, cookie, athlete_ids, port, server.pid))}
+    finally:
+        server.terminate()
+        server.wait()
+    results["hub"] = run_hub_benchmark(args.hub_subscribers, args.hub_publishes)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
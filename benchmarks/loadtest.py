@@ -0,0 +1,146 @@
+"""
+End-to-end load test: seeds a throwaway SQLite database with synthetic
+trainers and athletes, then drives the StatSync app in-process with
+concurrent httpx clients and reports throughput and p50/p95/p99 per route
+
+Each virtual user logs in once as an athlete or a trainer, then issues a
+weighted mix of that role's requests until the run ends. Every user connects
+from the same address, so the login throttle is lifted to fit --users, and the
+run stops if any login fails rather than timing requests that are all 401s.
+
+Usage: python benchmarks/loadtest.py [--trainers 20] [--athletes 2000] [--users 20] [--duration 10] [--output run.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from common import git_revision, prepare_app, summarize
+from synthetic import seed_database
+
+PASSWORD = "Passw0rd!"
+
+ATHLETE_MIX = [("GET /dashboard", 0.7), ("GET /download-stats", 0.3)]
+TRAINER_MIX = [("GET /trainer/dashboard", 0.4), ("GET /athletes", 0.4), ("PUT /athlete/{id}", 0.2)]
+
+
+class LoginFailed(RuntimeError):
+    """A virtual user could not log in, so its timings would mean nothing"""
+
+
+async def virtual_user(index, args, transport, deadline, samples, errors):
+    import httpx
+
+    rng = random.Random(index)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+
+        # The response, or None when the request raised
+        async def timed(name, method, url, **kwargs):
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                failed = response.status_code >= 400
+            except Exception:
+                response = None
+                failed = True
+            samples[name].append(time.perf_counter() - start)
+            if failed:
+                errors[name] += 1
+            return response
+
+        # Alternate personas; trainer j manages athletes j+1, j+1+T, j+1+2T, ...
+        if index % 2 == 0:
+            username = f"athlete{rng.randrange(args.athletes)}"
+            response = await timed("POST /login", "POST", "/login", data={"username": username, "password": PASSWORD})
+            mix = ATHLETE_MIX
+            roster = []
+        else:
+            trainer = rng.randrange(args.trainers)
+            username = f"trainer{trainer}"
+            response = await timed("POST /trainer/login", "POST", "/trainer/login", data={"username": username, "password": PASSWORD})
+            mix = TRAINER_MIX
+            roster = list(range(trainer + 1, args.athletes + 1, args.trainers))
+        # A successful login redirects to the dashboard
+        if response is None or response.status_code != 302:
+            raise LoginFailed(f"Login as {username} answered {response.status_code if response is not None else 'an exception'}")
+
+        names, weights = zip(*mix)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            if name == "PUT /athlete/{id}":
+                await timed(name, "PUT", f"/athlete/{rng.choice(roster)}",
+                            json={"body_weight": round(rng.uniform(50, 110), 1), "hydration_level": round(rng.uniform(50, 65), 1)})
+            else:
+                method, url = name.split(" ", 1)
+                await timed(name, method, url)
+
+
+async def run(args):
+    import httpx
+    from app import StatSync, prepare_worker
+    from auth import get_password_hash
+    from db import SessionLocal
+
+    # ASGITransport does not run the lifespan hook
+    prepare_worker()
+
+    started = time.perf_counter()
+    with SessionLocal() as session:
+        seed_database(session, args.trainers, args.athletes, get_password_hash(PASSWORD), seed=args.seed)
+    seed_seconds = time.perf_counter() - started
+
+    transport = httpx.ASGITransport(app=StatSync, raise_app_exceptions=False)
+    samples, errors = defaultdict(list), defaultdict(int)
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(virtual_user(i, args, transport, deadline, samples, errors) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for name in sorted(samples):
+        routes[name] = dict(summarize(samples[name]), errors=errors[name],
+                            rps=round(len(samples[name]) / elapsed, 2))
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "seed_seconds": round(seed_seconds, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "total_rps": round(sum(len(values) for values in samples.values()) / elapsed, 2),
+        "routes": routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trainers", type=int, default=20)
+    parser.add_argument("--athletes", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load after seeding")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Every virtual user logs in from the one ASGITransport address at the same moment
+    os.environ.setdefault("LOGIN_ADDRESS_BURST", str(args.users))
+    os.environ.setdefault("LOGIN_USERNAME_BURST", str(args.users))
+    os.environ.setdefault("LOGIN_MAX_PENDING_VERIFICATIONS", str(args.users))
+    prepare_app()
+    try:
+        report = asyncio.run(run(args))
+    except LoginFailed as e:
+        sys.exit(f"Load test stopped: {e}")
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measures login latency under a burst of concurrent logins, plus the latency
+of a cheap page (GET /) served at the same time, which shows how long the
+event loop is stalled by password hashing
+
+Every login comes from one address, so by default the login throttle is lifted
+to measure hashing alone; --throttled keeps the configured limits and counts
+the attempts answered 429.
+
+Usage: python benchmarks/login_latency.py [--logins 200] [--concurrency 20] [--throttled]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+
+from common import APP_DIR, prepare_app, summarize
+
+
+async def run(args):
+    import httpx
+    from app import StatSync, prepare_worker
+    from auth import get_password_hash
+    from db import SessionLocal
+    from models import Athlete
+
+    # ASGITransport does not run the lifespan hook
+    prepare_worker()
+
+    # Seed a handful of athletes sharing one password
+    password = "Passw0rd!"
+    hashed = get_password_hash(password)
+    with SessionLocal() as session:
+        for i in range(args.users):
+            session.add(Athlete(first_name="Bench", last_name=str(i), username=f"bench{i}",
+                                email=f"bench{i}@example.com", password=hashed))
+        session.commit()
+
+    transport = httpx.ASGITransport(app=StatSync)
+    login_times, probe_times = [], []
+    statuses = Counter()
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def login(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/login", data={"username": f"bench{i % args.users}", "password": password})
+                login_times.append(time.perf_counter() - start)
+                statuses[response.status_code] += 1
+                assert response.status_code in (302, 429), response.status_code
+
+        async def probe():
+            # Includes the time spent waiting for the loop to wake the probe up
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                await client.get("/")
+                probe_times.append(time.perf_counter() - start - 0.01)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "logins_per_s": round(args.logins / elapsed, 2),
+        "statuses": dict(sorted(statuses.items())),
+        "login": summarize(login_times),
+        "concurrent_home_page": summarize(probe_times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--throttled", action="store_true", help="keep the configured login throttle limits")
+    parser.add_argument("--app-dir", default=APP_DIR, help="checkout to benchmark (e.g. a worktree of an older commit)")
+    args = parser.parse_args()
+
+    if not args.throttled:
+        os.environ.setdefault("LOGIN_ADDRESS_BURST", str(args.logins))
+        os.environ.setdefault("LOGIN_USERNAME_BURST", str(args.logins))
+        os.environ.setdefault("LOGIN_MAX_PENDING_VERIFICATIONS", str(args.logins))
+    prepare_app(args.app_dir)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
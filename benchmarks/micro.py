@@ -0,0 +1,144 @@
+"""
+Microbenchmarks for the hot functions on the auth, serialization and PDF paths,
+compared against stored baselines to catch regressions before they ship
+
+Each benchmark is timed as the best of several repeats, in microseconds per
+operation. Baselines are machine specific: refresh them with --save on the
+machine that runs the comparison.
+
+Usage: python benchmarks/micro.py [--threshold 0.25] [--only NAME ...] [--save]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date
+from types import SimpleNamespace
+
+from common import git_revision, prepare_app
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "micro.json")
+ROSTER_SIZE = 100
+LIST_ROWS = 1000
+
+
+# Drive a coroutine that never suspends without the cost of an event loop
+def run_coroutine(coroutine):
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended")
+
+
+def build_benchmarks():
+    from starlette.requests import Request
+
+    from auth import create_access_token, get_current_user, get_password_hash, verify_password
+    from controller import DEFAULT_ATHLETE_LIST_FIELDS, templates
+    from pdf import athlete_stat_lines, render_stats_pdf
+    from schemas import dump_roster_page
+    from synthetic import athlete_rows
+
+    athletes = [SimpleNamespace(id=i + 1, **row) for i, row in enumerate(athlete_rows(LIST_ROWS, [1], "x"))]
+    token = create_access_token({"sub": "trainer0", "role": "trainer"})
+    request = Request({"type": "http", "headers": [(b"cookie", f"trainer_access_token={token}".encode())]})
+    password_hash = get_password_hash("Passw0rd!")
+    rows = [tuple(getattr(athlete, name, None) for name in DEFAULT_ATHLETE_LIST_FIELDS) for athlete in athletes]
+    template = templates.get_template("trainer_dashboard.html")
+    trainer = SimpleNamespace(first_name="Esther", last_name="Kiguru")
+    stat_lines = athlete_stat_lines(athletes[0])
+
+    return {
+        "create_access_token": lambda: create_access_token({"sub": "trainer0", "role": "trainer"}),
+        "get_current_user_jwt_decode": lambda: run_coroutine(get_current_user(request, "trainer")),
+        "verify_password": lambda: verify_password("Passw0rd!", password_hash),
+        f"list_athletes_json_x{LIST_ROWS}": lambda: dump_roster_page(rows, DEFAULT_ATHLETE_LIST_FIELDS, None),
+        f"render_trainer_dashboard_x{ROSTER_SIZE}": lambda: template.render(trainer=trainer, athletes=athletes[:ROSTER_SIZE]),
+        "render_stats_pdf": lambda: render_stats_pdf(stat_lines),
+    }
+
+
+# Best-of-repeats time per call, with the loop count calibrated to roughly `budget` seconds per repeat
+def measure(function, repeats=5, budget=0.2):
+    function()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget or loops >= 1_000_000:
+            break
+        loops *= max(2, min(10, int(budget / max(elapsed, 1e-9))))
+
+    best = elapsed / loops
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown as a fraction (0.25 = 25%%)")
+    parser.add_argument("--only", nargs="*", help="run only these benchmarks")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    prepare_app()
+    benchmarks = build_benchmarks()
+    names = args.only or list(benchmarks)
+
+    results = {name: round(measure(benchmarks[name]), 3) for name in names}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            baseline = json.load(handle).get("results_us", {})
+
+    regressions = []
+    unbaselined = []
+    report = {}
+    for name, value in results.items():
+        entry = {"us_per_op": value}
+        if name not in baseline:
+            unbaselined.append(name)
+        else:
+            change = value / baseline[name] - 1
+            entry.update(baseline_us=baseline[name], change=f"{change:+.1%}")
+            if change > args.threshold:
+                regressions.append(name)
+        report[name] = entry
+    print(json.dumps(report, indent=2))
+
+    if args.save:
+        from config import settings
+
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as handle:
+            json.dump({
+                "revision": git_revision(),
+                "saved": date.today().isoformat(),
+                "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+                # Entries for benchmarks that no longer exist are dropped
+                "results_us": dict({name: value for name, value in baseline.items() if name in benchmarks}, **results),
+            }, handle, indent=2)
+            handle.write("\n")
+        return
+
+    # A benchmark without a baseline is not gated, so it fails until --save records one
+    if unbaselined:
+        print(f"No baseline for: {', '.join(unbaselined)} (record one with --save)", file=sys.stderr)
+    if regressions:
+        print(f"Regressions beyond {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+    if unbaselined or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
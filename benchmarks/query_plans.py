@@ -0,0 +1,117 @@
+"""
+EXPLAIN QUERY PLAN check for the roster filter/sort grammar on GET /athletes
+
+Seeds a synthetic database and builds each roster query through the same code
+path as the endpoint. Indexed queries must search the index they are meant to
+use and must not sort in a temp b-tree. Unindexed queries are filtered or sorted
+over the trainer's whole roster; they are listed so that stays a known cost,
+and only fail on a full table scan. Run after touching filters or indexes.
+
+Usage: python benchmarks/query_plans.py [--athletes 5000] [--analyze] [--verbose]
+"""
+import argparse
+import sys
+
+from common import prepare_app
+
+# (name, filters, sort, index expected) as a trainer would send them; each index
+# serves both the filter and the order, rowid last as the id tie-break
+INDEXED_QUERIES = [
+    ("default page", [], None, "ix_athletes_trainer_id"),
+    ("age range by age", ["age:gte:18", "age:lte:25"], "age", "ix_athletes_trainer_age"),
+    ("gender and age", ["gender:eq:M", "age:gt:30"], "-age", "ix_athletes_trainer_age"),
+    ("sport by position", ["sports_playing:eq:Rugby"], "position", "ix_athletes_trainer_sport_position"),
+    ("sport and position", ["sports_playing:eq:Football", "position:eq:Forward"], None, "ix_athletes_trainer_sport_position"),
+    ("sport and positions", ["sports_playing:eq:Football", "position:in:Forward|Midfielder"], "position", "ix_athletes_trainer_sport_position"),
+    ("registration window", ["registration_date:gte:2025-01-01", "registration_date:lt:2025-07-01"], "-registration_date", "ix_athletes_trainer_registration"),
+]
+# No index of their own: gender alone, the metrics, and orders other than the filtered column
+UNINDEXED_QUERIES = [
+    ("gender", ["gender:eq:F"], None),
+    ("sport", ["sports_playing:eq:Rugby"], None),
+    ("sport by last name", ["sports_playing:eq:Football", "position:in:Forward|Midfielder"], "last_name"),
+    ("age range", ["age:gte:18", "age:lte:25"], None),
+    ("missing bmr", ["bmr:null"], None),
+    ("missing metrics", ["muscle_mass:null", "hydration_level:null"], "first_name"),
+    ("sort by metric", [], "-bmr"),
+    ("filtered metric sort", ["age:gte:20", "body_weight:notnull"], "muscle_mass"),
+]
+
+
+def explain(connection, query):
+    compiled = query.compile(connection, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")]
+
+
+# A full scan shows up as "SCAN athletes", with or without "USING INDEX"
+def is_full_scan(detail: str) -> bool:
+    return detail.startswith("SCAN athletes")
+
+
+def uses_index(detail: str, index: str) -> bool:
+    return detail.startswith(f"SEARCH athletes USING INDEX {index} ") or detail.startswith(f"SEARCH athletes USING COVERING INDEX {index} ")
+
+
+def is_sort(detail: str) -> bool:
+    return detail.startswith("USE TEMP B-TREE")
+
+
+# What is wrong with a plan, or None; unindexed queries only have to avoid a full scan
+def plan_problem(plan, index):
+    if any(is_full_scan(detail) for detail in plan):
+        return "FULL SCAN"
+    if index is None:
+        return None
+    if not any(uses_index(detail, index) for detail in plan):
+        return "WRONG INDEX"
+    if any(is_sort(detail) for detail in plan):
+        return "TEMP SORT"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--athletes", type=int, default=5000)
+    parser.add_argument("--trainers", type=int, default=20)
+    parser.add_argument("--analyze", action="store_true", help="Run ANALYZE first so the planner has statistics")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan, not just failures")
+    args = parser.parse_args()
+
+    prepare_app()
+    from controller import ATHLETE_LIST_FIELDS, DEFAULT_ATHLETE_LIST_FIELDS
+    from db import Base, SessionLocal, engine
+    from roster_query import roster_select
+    from synthetic import seed_database
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        trainer_ids, _ = seed_database(session, args.trainers, args.athletes, "x")
+
+    failures = 0
+    queries = [(name, filters, sort, index) for name, filters, sort, index in INDEXED_QUERIES]
+    queries += [(name, filters, sort, None) for name, filters, sort in UNINDEXED_QUERIES]
+    with engine.connect() as connection:
+        if args.analyze:
+            connection.exec_driver_sql("ANALYZE")
+        for owner in (trainer_ids[0], None):
+            for name, filters, sort, index in queries:
+                query, sort_field = roster_select(owner, filters, sort, None)
+                field_names = DEFAULT_ATHLETE_LIST_FIELDS + [sort_field] * (sort_field not in DEFAULT_ATHLETE_LIST_FIELDS)
+                query = query.add_columns(*(ATHLETE_LIST_FIELDS[field] for field in field_names))
+                plan = explain(connection, query)
+                problem = plan_problem(plan, index)
+                failures += problem is not None
+                label = f"{name} ({'roster' if owner else 'unassigned'}, {index or 'unindexed'})"
+                if problem or args.verbose:
+                    print(f"{problem or 'ok':11} {label}")
+                    for detail in plan:
+                        print(f"            {detail}")
+
+    total = 2 * len(queries)
+    print(f"{total - failures}/{total} roster queries plan as expected "
+          f"({2 * len(INDEXED_QUERIES)} on their index without a sort, the rest without a full scan)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Athlete list serialization: the hand-built dict loop against the schema path
+
+Times one /athletes page worth of JSON for --rows rows, in microseconds per row,
+two ways each:
+  serialize  rows already fetched; athlete_row_to_dict plus the json.dumps that
+             JSONResponse runs, against schemas.dump_roster_page
+  end_to_end fetch and serialize from a seeded database; whole ORM objects read
+             field by field, against selected column tuples into the schema path
+
+Usage: python benchmarks/serialization.py [--rows 10000] [--fields all|default]
+"""
+import argparse
+import json
+import time
+
+from common import athlete_row_to_dict, prepare_app
+
+
+def best_of(function, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+# What JSONResponse does with a content dict
+def render_json_response(content) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--fields", choices=["all", "default"], default="all")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    prepare_app()
+    from sqlalchemy import select
+
+    from controller import ATHLETE_LIST_FIELDS, DEFAULT_ATHLETE_LIST_FIELDS
+    from db import Base, SessionLocal, engine
+    from models import Athlete
+    from schemas import dump_roster_page
+    from synthetic import seed_database
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        seed_database(session, 1, args.rows, "x")
+
+    field_names = list(ATHLETE_LIST_FIELDS) if args.fields == "all" else DEFAULT_ATHLETE_LIST_FIELDS
+    columns = [ATHLETE_LIST_FIELDS[name] for name in field_names]
+    attributes = [column.key for column in columns]
+
+    with SessionLocal() as session:
+        rows = session.execute(select(*columns).order_by(Athlete.id)).all()
+
+    def dict_loop():
+        return render_json_response({"athletes": [athlete_row_to_dict(row, field_names) for row in rows], "next_cursor": None})
+
+    def schema_path():
+        return dump_roster_page(rows, field_names, None).encode()
+
+    # The same document either way, up to how floats stored as integers are written
+    assert json.loads(dict_loop()) == json.loads(schema_path())
+
+    def orm_dict_loop():
+        with SessionLocal() as session:
+            athletes = session.scalars(select(Athlete).order_by(Athlete.id)).all()
+            return render_json_response({"athletes": [
+                athlete_row_to_dict([getattr(athlete, name) for name in attributes], field_names) for athlete in athletes
+            ], "next_cursor": None})
+
+    def tuples_schema_path():
+        with SessionLocal() as session:
+            return dump_roster_page(session.execute(select(*columns).order_by(Athlete.id)).all(), field_names, None).encode()
+
+    results = {"rows": len(rows), "fields": len(field_names)}
+    for section, (before, after) in {
+        "serialize": (dict_loop, schema_path),
+        "end_to_end": (orm_dict_loop, tuples_schema_path),
+    }.items():
+        before_seconds = best_of(before, args.repeats)
+        after_seconds = best_of(after, args.repeats)
+        results[section] = {
+            "dict_loop_us_per_row": round(before_seconds / len(rows) * 1e6, 3),
+            "schema_us_per_row": round(after_seconds / len(rows) * 1e6, 3),
+            "speedup": round(before_seconds / after_seconds, 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Mixed read/write throughput against SQLite with and without the connection
+profile from config.Settings (WAL, synchronous, mmap, cache and busy timeout)
+
+Writer threads update athletes and append history rows while reader threads
+load trainer rosters. Each mode runs in a fresh process on a fresh database.
+
+Usage: python benchmarks/sqlite_profile.py [--seconds 5] [--readers 4] [--writers 2]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import APP_DIR
+
+
+def run_mode(args):
+    from sqlalchemy import insert, select, update
+    from sqlalchemy.exc import OperationalError
+
+    from db import Base, SessionLocal, engine
+    from models import Athlete, Measurement, Trainer
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        trainers = [Trainer(username=f"t{i}", email=f"t{i}@example.com") for i in range(args.trainers)]
+        session.add_all(trainers)
+        session.flush()
+        session.execute(insert(Athlete), [
+            {"username": f"a{i}", "email": f"a{i}@example.com", "first_name": "A", "last_name": str(i),
+             "trainer_id": trainers[i % args.trainers].id, "body_weight": 70.0}
+            for i in range(args.athletes)
+        ])
+        session.commit()
+
+    counts = {"reads": 0, "writes": 0, "locked_errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def reader():
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            try:
+                with SessionLocal() as session:
+                    session.scalars(select(Athlete).where(Athlete.trainer_id == rng.randint(1, args.trainers))).all()
+                bump("reads")
+            except OperationalError:
+                bump("locked_errors")
+
+    def writer():
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            athlete_id = rng.randint(1, args.athletes)
+            weight = rng.uniform(50, 110)
+            try:
+                with SessionLocal() as session:
+                    session.execute(update(Athlete).where(Athlete.id == athlete_id).values(body_weight=weight))
+                    session.execute(insert(Measurement).values(
+                        athlete_id=athlete_id, metric=1, recorded_at=int(time.time()), value=weight))
+                    session.commit()
+                bump("writes")
+            except OperationalError:
+                bump("locked_errors")
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+    return {
+        "journal_mode": journal_mode,
+        "reads_per_s": round(counts["reads"] / args.seconds, 1),
+        "writes_per_s": round(counts["writes"] / args.seconds, 1),
+        "locked_errors": counts["locked_errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--trainers", type=int, default=20)
+    parser.add_argument("--athletes", type=int, default=2000)
+    parser.add_argument("--mode", choices=["profile", "default"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        os.chdir(APP_DIR)
+        sys.path.insert(0, APP_DIR)
+        print(json.dumps(run_mode(args)))
+        return
+
+    results = {}
+    for mode in ("default", "profile"):
+        workdir = tempfile.mkdtemp(prefix="statsync-bench-")
+        env = dict(os.environ,
+                   DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                   SQLITE_PRAGMAS="true" if mode == "profile" else "false")
+        output = subprocess.run([sys.executable, __file__, "--mode", mode] + sys.argv[1:],
+                                env=env, check=True, capture_output=True, text=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
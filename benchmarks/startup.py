@@ -0,0 +1,108 @@
+"""
+Worker cold start: `import app` under -X importtime, and the startup hook that runs before serving
+
+Each run is a fresh interpreter against a throwaway database, as a respawned
+worker would be. Reports the median import time of the app, the slowest
+top-level packages by the import time they add, which heavy optional modules
+got loaded, and how long the startup hook takes on a current and on an empty
+database. Point --app-dir at another checkout to compare revisions.
+
+Usage: python benchmarks/startup.py [--runs 7] [--top 12] [--app-dir PATH]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+from common import APP_DIR
+
+HEAVY_MODULES = ["reportlab", "PIL", "numpy"]
+HOOK_MARKER = "-- startup hook --"
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# Runs in the child: import the app, then run the startup hook if this revision has one
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter() - started
+loaded = [name for name in {heavy!r} if name in sys.modules]
+print({marker!r}, file=sys.stderr, flush=True)
+hook = None
+if hasattr(app, "prepare_worker"):
+    started = time.perf_counter()
+    app.prepare_worker()
+    hook = time.perf_counter() - started
+print(json.dumps({{"import": imported, "hook": hook, "heavy": loaded}}))
+"""
+
+
+def run_child(app_dir: str, database: str, workdir: str) -> dict:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{database}",
+        ASSET_BUILD_DIR=os.path.join(workdir, "assets"),
+        TEMPLATE_CACHE_DIR=os.path.join(workdir, "templates"),
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(heavy=HEAVY_MODULES, marker=HOOK_MARKER)],
+        cwd=app_dir, env=env, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    # Self time per top-level package, for what `import app` loads
+    packages = defaultdict(int)
+    for line in completed.stderr.splitlines():
+        if line == HOOK_MARKER:
+            break
+        match = IMPORT_LINE.match(line)
+        if match:
+            packages[match.group(4).split(".")[0]] += int(match.group(1))
+    result["packages"] = packages
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--app-dir", default=APP_DIR)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="statsync-startup-")
+    try:
+        database = os.path.join(workdir, "startup.db")
+        # First run: empty database, nothing built or cached yet
+        first = run_child(args.app_dir, database, workdir)
+        runs = [run_child(args.app_dir, database, workdir) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(workdir)
+
+    packages = defaultdict(list)
+    for run in runs:
+        for name, microseconds in run["packages"].items():
+            packages[name].append(microseconds)
+    slowest = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+
+    hooks = [run["hook"] for run in runs if run["hook"] is not None]
+    print(json.dumps({
+        "runs": args.runs,
+        "import_app_ms": round(statistics.median(run["import"] for run in runs) * 1000, 1),
+        "heavy_modules_loaded": runs[-1]["heavy"],
+        "startup_hook_ms": {
+            "empty_database": round(first["hook"] * 1000, 1) if first["hook"] is not None else None,
+            "current_database": round(statistics.median(hooks) * 1000, 1) if hooks else None,
+        },
+        "first_run_import_ms": round(first["import"] * 1000, 1),
+        "slowest_packages_ms": {name: round(statistics.median(values) / 1000, 1) for name, values in slowest},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Synthetic trainers and athletes with realistic column values, for seeding benchmark databases
+"""
+import random
+from datetime import date, timedelta
+from itertools import islice
+from typing import Iterator, List
+
+FIRST_NAMES = {
+    "M": ["James", "Kofi", "Luis", "Wei", "Daniel", "Brian", "Omar", "Mateo", "Samuel", "Kevin", "Arjun", "Felix"],
+    "F": ["Amina", "Grace", "Sofia", "Mei", "Esther", "Wanjiru", "Chloe", "Priya", "Lucia", "Hannah", "Zara", "Ines"],
+}
+LAST_NAMES = ["Kiguru", "Otieno", "Smith", "Garcia", "Chen", "Mensah", "Novak", "Okafor", "Silva", "Kim",
+              "Muller", "Haddad", "Patel", "Johansson", "Ito", "Kamau", "Rossi", "Nguyen", "Dubois", "Walker"]
+SPORTS = {
+    "Football": ["Goalkeeper", "Defender", "Midfielder", "Forward"],
+    "Basketball": ["Point Guard", "Shooting Guard", "Small Forward", "Power Forward", "Center"],
+    "Rugby": ["Prop", "Hooker", "Lock", "Flanker", "Scrum-half", "Fly-half", "Wing", "Fullback"],
+    "Athletics": ["Sprinter", "Middle Distance", "Long Distance", "Jumper", "Thrower"],
+    "Volleyball": ["Setter", "Libero", "Outside Hitter", "Middle Blocker"],
+}
+INJURIES = [None, None, None, "Hamstring strain (2023)", "ACL reconstruction (2022)", "Ankle sprain",
+            "Shoulder dislocation (2021)", "Stress fracture, left tibia", "Concussion (2024)"]
+CONDITIONS = [None, None, None, None, "Asthma", "Type 1 diabetes", "Iron deficiency anaemia"]
+ALLERGIES = [None, None, None, "Peanuts", "Penicillin", "Pollen", "Lactose"]
+GOALS = ["Increase sprint speed", "Build lean muscle", "Reduce body fat", "Improve endurance",
+         "Return from injury", "Improve vertical jump", None]
+SPECIALTIES = ["Strength and conditioning", "Sports nutrition", "Rehabilitation", "Speed and agility", "Endurance"]
+
+
+def _birth_date(rng: random.Random, age: int) -> date:
+    return date.today() - timedelta(days=age * 365 + rng.randint(0, 364))
+
+
+def trainer_rows(count: int, password_hash: str, seed: int = 0) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for i in range(count):
+        gender = rng.choice("MF")
+        yield {
+            "first_name": rng.choice(FIRST_NAMES[gender]),
+            "last_name": rng.choice(LAST_NAMES),
+            "gender": gender,
+            "email": f"trainer{i}@example.com",
+            "username": f"trainer{i}",
+            "password": password_hash,
+            "date_of_birth": _birth_date(rng, rng.randint(28, 60)),
+            "specialties": rng.choice(SPECIALTIES),
+            "experience": f"{rng.randint(2, 25)} years",
+            "contact_number": f"+2547{rng.randint(10000000, 99999999)}",
+            "registration_date": date.today() - timedelta(days=rng.randint(0, 1500)),
+        }
+
+
+def athlete_rows(count: int, trainer_ids: List[int], password_hash: str, seed: int = 0) -> Iterator[dict]:
+    rng = random.Random(seed + 1)
+    for i in range(count):
+        gender = rng.choice("MF")
+        age = rng.randint(16, 35)
+        sport = rng.choice(list(SPORTS))
+        height = rng.gauss(178 if gender == "M" else 166, 8)
+        weight = max(45.0, rng.gauss(78 if gender == "M" else 63, 9))
+        # Mifflin-St Jeor estimate
+        bmr = 10 * weight + 6.25 * height - 5 * age + (5 if gender == "M" else -161)
+        yield {
+            "first_name": rng.choice(FIRST_NAMES[gender]),
+            "last_name": rng.choice(LAST_NAMES),
+            "gender": gender,
+            "age": age,
+            "date_of_birth": _birth_date(rng, age),
+            "address": f"{rng.randint(1, 999)} {rng.choice(LAST_NAMES)} Road, Nairobi",
+            "username": f"athlete{i}",
+            "email": f"athlete{i}@example.com",
+            "password": password_hash,
+            "body_weight": round(weight, 1),
+            "Height": round(height, 1),
+            "bmr": round(bmr, 1),
+            "hydration_level": round(rng.uniform(50, 65), 1),
+            "muscle_mass": round(weight * rng.uniform(0.38, 0.5), 1),
+            "injury_history": rng.choice(INJURIES),
+            "medical_condition": rng.choice(CONDITIONS),
+            "allergies": rng.choice(ALLERGIES),
+            "sports_playing": sport,
+            "position": rng.choice(SPORTS[sport]),
+            "contact_number": f"+2547{rng.randint(10000000, 99999999)}",
+            "emergency_contact": f"{rng.choice(FIRST_NAMES['F' if gender == 'M' else 'M'])} {rng.choice(LAST_NAMES)}",
+            "emergency_contact_number": f"+2547{rng.randint(10000000, 99999999)}",
+            "training_goal": rng.choice(GOALS),
+            "registration_date": date.today() - timedelta(days=rng.randint(0, 1100)),
+            "trainer_id": trainer_ids[i % len(trainer_ids)] if trainer_ids else None,
+        }
+
+
+# Insert the synthetic population in chunks; returns (trainer ids, athlete count)
+def seed_database(session, trainers: int, athletes: int, password_hash: str, seed: int = 0, chunk_size: int = 5000):
+    from sqlalchemy import insert, select
+
+    from models import Athlete, Trainer
+
+    session.execute(insert(Trainer), list(trainer_rows(trainers, password_hash, seed)))
+    trainer_ids = list(session.scalars(select(Trainer.id).order_by(Trainer.id)))
+
+    rows = athlete_rows(athletes, trainer_ids, password_hash, seed)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        session.execute(insert(Athlete), chunk)
+    session.commit()
+    return trainer_ids, athletes
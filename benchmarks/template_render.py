@@ -0,0 +1,150 @@
+"""
+Trainer dashboard rendering: time to first byte against roster size, and cold template loads
+
+For each roster size, times GET /trainer/dashboard through the ASGI app (streamed
+render) against the previous handler, which loaded every athlete and rendered the
+whole page before sending it. Then times loading all templates into a fresh
+environment with no bytecode cache, with an empty one and with a filled one, as
+a newly started worker would.
+
+Usage: python benchmarks/template_render.py [--sizes 100 1000 10000] [--repeats 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from common import prepare_app, summarize
+
+
+# Drive the ASGI app for one GET; returns (seconds to first body byte, seconds to last, body size)
+async def timed_get(app, path: str, cookie: str):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"cookie", cookie.encode())], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    first = None
+    size = 0
+    requested = False
+    done = asyncio.Event()
+    started = time.perf_counter()
+
+    # The request, then nothing until the response is complete, as from a client that stays connected
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal first, size
+        if message["type"] == "http.response.body" and message.get("body"):
+            if first is None:
+                first = time.perf_counter() - started
+            size += len(message["body"])
+        if message["type"] == "http.response.body" and not message.get("more_body"):
+            done.set()
+
+    await app(scope, receive, send)
+    return first, time.perf_counter() - started, size
+
+
+# The handler as it was: every athlete loaded as an ORM object, then one render, then one send
+async def buffered_dashboard(trainer_id: int):
+    from sqlalchemy import select
+
+    from controller import templates
+    from db import session_scope
+    from models import Athlete, Trainer
+
+    started = time.perf_counter()
+    async with session_scope() as db:
+        trainer = await db.get(Trainer, trainer_id)
+        athletes = (await db.scalars(
+            select(Athlete).where(Athlete.trainer_id == trainer_id).order_by(Athlete.last_name, Athlete.first_name)
+        )).all()
+    body = templates.get_template("trainer_dashboard.html").render(request=None, trainer=trainer, athletes=athletes)
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed, len(body.encode())
+
+
+def template_load_seconds(cache_dir, repeats: int) -> float:
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+    from templating import TEMPLATE_DIR
+
+    best = float("inf")
+    for _ in range(repeats):
+        environment = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR), autoescape=True,
+            bytecode_cache=FileSystemBytecodeCache(cache_dir) if cache_dir else None,
+        )
+        started = time.perf_counter()
+        for name in environment.list_templates(extensions=["html"]):
+            environment.get_template(name)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = prepare_app()
+    os.environ.setdefault("ASSET_BUILD_DIR", os.path.join(workdir, "assets"))
+    os.environ.setdefault("TEMPLATE_CACHE_DIR", os.path.join(workdir, "templates"))
+    from sqlalchemy import case, update
+
+    from app import StatSync, prepare_worker
+    from auth import create_access_token
+    from db import SessionLocal
+    from models import Athlete
+    from synthetic import seed_database
+
+    prepare_worker()
+    cookie = "trainer_access_token=" + create_access_token({"sub": "trainer0", "role": "trainer"})
+    with SessionLocal() as session:
+        seed_database(session, 1, max(args.sizes), "x")
+
+    results = {"dashboard": []}
+    for size in sorted(args.sizes):
+        # The one trainer's roster is the first `size` athletes
+        with SessionLocal() as session:
+            session.execute(update(Athlete).values(trainer_id=case((Athlete.id <= size, 1), else_=None)))
+            session.commit()
+
+        streamed = [asyncio.run(timed_get(StatSync, "/trainer/dashboard", cookie)) for _ in range(args.repeats)]
+        buffered = [asyncio.run(buffered_dashboard(1)) for _ in range(args.repeats)]
+        results["dashboard"].append({
+            "roster": size,
+            "bytes": streamed[-1][2],
+            "streamed_first_byte": summarize([run[0] for run in streamed]),
+            "streamed_complete": summarize([run[1] for run in streamed]),
+            "buffered_first_byte": summarize([run[0] for run in buffered]),
+        })
+
+    cache_dir = tempfile.mkdtemp(prefix="statsync-bccache-")
+    try:
+        no_cache = template_load_seconds(None, args.repeats)
+        cold_cache = template_load_seconds(cache_dir, 1)
+        warm_cache = template_load_seconds(cache_dir, args.repeats)
+    finally:
+        shutil.rmtree(cache_dir)
+    results["template_load_ms"] = {
+        "no_bytecode_cache": round(no_cache * 1000, 2),
+        "filling_cache": round(cold_cache * 1000, 2),
+        "from_cache": round(warm_cache * 1000, 2),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Conditional GET for athlete resources: strong ETags and Last-Modified from the row version
+"""
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+# Every client revalidates; shared caches never store another athlete's data
+CACHE_CONTROL = "private, no-cache"
+
+_revisions: Dict[str, tuple] = {}
+
+
+# Short content hash of a file the representation is rendered from, recomputed when it changes
+def source_revision(path: str) -> str:
+    mtime = os.stat(path).st_mtime_ns
+    cached = _revisions.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, "rb") as source:
+            cached = (mtime, hashlib.sha1(source.read()).hexdigest()[:8])
+        _revisions[path] = cached
+    return cached[1]
+
+
+# Strong ETag for one representation of an athlete at its current row version
+def athlete_etag(athlete, representation: str, revision: str = "") -> str:
+    tag = f"{representation}-{athlete.id}-{athlete.version}"
+    return f'"{tag}-{revision}"' if revision else f'"{tag}"'
+
+
+def http_date(moment: Optional[datetime]) -> Optional[str]:
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+# Validator headers to send with both full and 304 responses
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+# If-None-Match wins over If-Modified-Since, as RFC 9110 requires
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0) if last_modified.tzinfo is None else last_modified.replace(microsecond=0)
+    return modified <= since
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -1,10 +1,78 @@
 from pydantic_settings import BaseSettings
+from typing import List
 
 class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 2880
 
+    # Database settings
+    DATABASE_URL: str = "sqlite:///./StatsyncDB.db"
+    # Apply pending schema migrations when a worker starts; turn off when deploys
+    # run `python migrations.py` once, and workers only check the version
+    MIGRATE_ON_STARTUP: bool = True
+    # Use the aiosqlite engine for request handlers; set to False to fall back
+    # to the blocking SessionLocal path (useful for benchmarking the two)
+    ASYNC_DB: bool = True
+
+    # SQLite connection profile, applied to every new connection
+    SQLITE_PRAGMAS: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE: int = -64 * 1024  # Negative values are KiB
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_FOREIGN_KEYS: bool = True
+
+    # Password hashing settings
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # Login throttling, per worker: token buckets per client address and per username,
+    # and a cap on password checks queued or running at once; over any of them, 429
+    LOGIN_ADDRESS_RATE_PER_MINUTE: float = 30
+    LOGIN_ADDRESS_BURST: int = 20
+    LOGIN_USERNAME_RATE_PER_MINUTE: float = 6
+    LOGIN_USERNAME_BURST: int = 5
+    LOGIN_THROTTLE_MAX_KEYS: int = 10000
+    LOGIN_MAX_PENDING_VERIFICATIONS: int = 8
+    LOGIN_BUSY_RETRY_AFTER_SECONDS: int = 1
+
+    # Verified-principal cache: decoded tokens mapped to the user's identity (rows are read per request)
+    PRINCIPAL_CACHE_SIZE: int = 1024
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+
+    # PDF export settings
+    PDF_WORKERS: int = 2
+    PDF_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # Roster analytics results are kept until the next athlete write, or this long at most
+    ANALYTICS_CACHE_TTL_SECONDS: int = 300
+
+    # Static asset pipeline: fingerprinted, resized and precompressed copies of static/
+    ASSET_SOURCE_DIR: str = "static"
+    ASSET_BUILD_DIR: str = "build/assets"
+    ASSET_BUILD_ON_STARTUP: bool = True
+    ASSET_IMAGE_WIDTHS: List[int] = [320, 640, 1024, 1600]
+    ASSET_WEBP_QUALITY: int = 80
+    ASSET_JPEG_QUALITY: int = 82
+
+    # Profile photos: content-addressed originals plus square WebP thumbnails
+    PHOTO_DIR: str = "media/photos"
+    PHOTO_MAX_BYTES: int = 10 * 1024 * 1024
+    PHOTO_THUMBNAIL_SIZES: List[int] = [64, 160, 320]
+    PHOTO_WEBP_QUALITY: int = 80
+    PHOTO_WORKERS: int = 2
+
+    # Compiled templates persist here across restarts; empty disables the cache.
+    # Turn auto reload off in production to skip checking template files for changes
+    TEMPLATE_CACHE_DIR: str = "build/templates"
+    TEMPLATE_AUTO_RELOAD: bool = True
+
+    # Live athlete updates: clients that cannot take a message this fast are disconnected
+    LIVE_SEND_TIMEOUT_SECONDS: float = 10.0
+
     class Config:
         env_file = ".env" 
 
@@ -1,56 +1,89 @@
 """
 handles API endpoints related to user authentication
 """
-from fastapi import APIRouter, Depends, HTTPException, Request, Response, Cookie, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from sqlalchemy.orm import Session
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
-from io import BytesIO
-from db import get_db
-from forms import LoginForm, SignUpForm
+import logging
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Cookie, Form, Query, UploadFile, File, WebSocket
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse, PlainTextResponse
+from sqlalchemy import case, delete, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import get_db, session_scope
+from forms import LoginForm, SignUpForm, AthleteUpdate
 from fastapi.responses import JSONResponse
-from models import Athlete, Trainer
-from bcrypt import hashpw, gensalt
-from fastapi.templating import Jinja2Templates
-from datetime import date
+from models import Athlete, Trainer, Measurement, METRIC_CODES
+from history import record_measurements, record_measurement_batch, downsampled_history, apply_measurement_batch
+from ingest import iter_records, next_batch, validate_batch
+from pdf import athlete_stats_pdf, pdf_revision, stream_stats_zip
+from metrics import render_metrics
+from assets import install_template_helpers
+from photos import PhotoError, find_photo_file, photo_response, photo_url, store_photo
+from live import live_hub, stream_athlete_updates
+from conditional import athlete_etag, is_not_modified, not_modified, source_revision, validator_headers
+from search import search_athletes
+from schemas import AthleteBatchResult, AthleteEditResult, AthleteProfile, AthleteStats, AthleteStatsUpdated, RosterPage, dump_athlete_row, dump_model_row, dump_roster_page, model_columns
+from roster_query import RosterQueryError, next_cursor_for, roster_select
+from analytics import ANALYTICS_GROUPS, ANALYTICS_METRICS, invalidate_analytics, roster_analytics
+from templating import TEMPLATE_DIR, create_streaming_environment, create_templates, stream_template
+from datetime import date, datetime, timedelta, timezone
 from trainers_forms import TrainerSignUpForm, TrainerLoginForm
-from auth import SECRET_KEY, ALGORITHM, authenticate_user, create_access_token, get_current_user, get_current_athlete, get_current_trainer
+from auth import SECRET_KEY, ALGORITHM, authenticate_user, hash_password_async, create_access_token, get_current_user, get_current_athlete, get_current_trainer, get_current_principal, invalidate_principal, principal_cache, resolve_principal, TOKEN_COOKIES
 from pydantic import BaseModel, ValidationError
-from typing import Optional
+from typing import Dict, List, Optional
 from jose import jwt, JWTError
 from config import settings 
+from throttle import LoginThrottled, client_address, login_throttle
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # Template setup for rendering HTML pages
-templates = Jinja2Templates(directory="templates")
+templates = create_templates()
+install_template_helpers(templates.env)
+templates.env.globals["photo_url"] = photo_url
+# Async overlay sharing the globals above, for pages streamed while their rows are read
+streaming_environment = create_streaming_environment(templates.env)
 
 # Route for the home page
 @router.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+# Prometheus text exposition of request, query and PDF metrics
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Route for the Athlete login page
 @router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
 
+# The login form again, with 429 and when to retry
+def login_throttled_response(template: str, request: Request, form_data, throttled: LoginThrottled):
+    return templates.TemplateResponse(
+        template,
+        {"request": request, "form": form_data, "error": f"Too many login attempts, try again in {throttled.retry_after} seconds"},
+        status_code=429,
+        headers={"Retry-After": str(throttled.retry_after)},
+    )
+
 # Login endpoint for an athlete
 @router.post("/login")
-async def login(response: Response, request: Request, form_data: LoginForm = Depends(LoginForm.as_form), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password, role="athlete")
+async def login(response: Response, request: Request, form_data: LoginForm = Depends(LoginForm.as_form), db: AsyncSession = Depends(get_db)):
+    try:
+        with login_throttle.admit(client_address(request), "athlete", form_data.username):
+            user = await authenticate_user(db, form_data.username, form_data.password, role="athlete")
+    except LoginThrottled as throttled:
+        return login_throttled_response("login.html", request, form_data, throttled)
     if not user:
         return templates.TemplateResponse("login.html", {"request": request, "form": form_data, "error": "Invalid credentials"})
 
     access_token = create_access_token(data={"sub": user.username, "role": "athlete"})
 
-    # Debugging: Print the generated token
-    print(f"Generated JWT Token for athlete: {access_token}")
+    logger.debug("Generated JWT token for athlete %s", user.username)
 
     response = RedirectResponse(url="/dashboard", status_code=302)
     response.set_cookie(
@@ -73,11 +106,11 @@ async def signup_page(request: Request):
    
 # Signup endpoint for a new athlete
 @router.post('/signup')
-async def signup(request: Request, form_data: SignUpForm = Depends(SignUpForm.as_form), db: Session = Depends(get_db)):
+async def signup(request: Request, form_data: SignUpForm = Depends(SignUpForm.as_form), db: AsyncSession = Depends(get_db)):
     # Check if username or email already exists
-    db_athlete = db.query(Athlete).filter(
+    db_athlete = await db.scalar(select(Athlete).where(
         (Athlete.username == form_data.username) | (Athlete.email == form_data.email)
-    ).first()
+    ))
 
     if db_athlete:
         return templates.TemplateResponse("signup.html", {
@@ -95,7 +128,7 @@ async def signup(request: Request, form_data: SignUpForm = Depends(SignUpForm.as
         })
 
     # Hash the password for security
-    hashed_password = hashpw(form_data.password.encode(), gensalt())
+    hashed_password = await hash_password_async(form_data.password)
 
     # Create new athlete instance
     new_athlete = Athlete(
@@ -107,7 +140,7 @@ async def signup(request: Request, form_data: SignUpForm = Depends(SignUpForm.as
         address=form_data.address,
         username=form_data.username,
         email=form_data.email,
-        password=hashed_password.decode(),
+        password=hashed_password,
         body_weight=form_data.body_weight,
         Height=form_data.height,
         bmr=form_data.bmr,
@@ -126,16 +159,22 @@ async def signup(request: Request, form_data: SignUpForm = Depends(SignUpForm.as
     )
 
     db.add(new_athlete)
-    db.commit()
-    db.refresh(new_athlete)
+    await db.flush()
+    # The signup values are the first readings in the athlete's history
+    await record_measurements(db, new_athlete.id, {name: getattr(new_athlete, name) for name in METRIC_CODES})
+    await db.commit()
+    await db.refresh(new_athlete)
+    invalidate_principal("athlete", new_athlete.username)
+    invalidate_analytics()
 
     # Redirect to login page after successful signup
     return RedirectResponse(url="/login", status_code=302)
 
 # Logout route for athletes
 @router.get("/athlete/logout")
-async def logout_athlete(response: Response):
+async def logout_athlete(request: Request, response: Response):
     # Remove the athlete's JWT token 
+    principal_cache.pop(request.cookies.get("athlete_access_token"))
     response = RedirectResponse(url="/", status_code=302)
     response.delete_cookie(key="athlete_access_token")
     return response
@@ -147,9 +186,13 @@ async def trainer_login_page(request: Request):
 
 # Login endpoint for a trainer
 @router.post("/trainer/login")
-async def trainer_login(request: Request, response = Response, form_data: TrainerLoginForm = Depends(TrainerLoginForm.as_form), db: Session = Depends(get_db)):
+async def trainer_login(request: Request, response = Response, form_data: TrainerLoginForm = Depends(TrainerLoginForm.as_form), db: AsyncSession = Depends(get_db)):
     # Authenticate the trainer
-    user = authenticate_user(db, form_data.username, form_data.password, role="trainer")
+    try:
+        with login_throttle.admit(client_address(request), "trainer", form_data.username):
+            user = await authenticate_user(db, form_data.username, form_data.password, role="trainer")
+    except LoginThrottled as throttled:
+        return login_throttled_response("trainerlogin.html", request, form_data, throttled)
 
     if not user:
         return templates.TemplateResponse("trainerlogin.html", {"request": request, "form": form_data, "error": "Invalid credentials"})
@@ -179,11 +222,11 @@ async def trainer_signup_page(request: Request):
   
 # Signup endpoint for a new trainer
 @router.post('/trainer/signup')
-async def trainer_signup(request: Request, form_data: TrainerSignUpForm = Depends(TrainerSignUpForm.as_form), db: Session = Depends(get_db)):
+async def trainer_signup(request: Request, form_data: TrainerSignUpForm = Depends(TrainerSignUpForm.as_form), db: AsyncSession = Depends(get_db)):
     # Check if username or email already exists
-    db_trainer = db.query(Trainer).filter(
+    db_trainer = await db.scalar(select(Trainer).where(
         (Trainer.username == form_data.username) | (Trainer.email == form_data.email)
-    ).first()
+    ))
 
     if db_trainer:
         return templates.TemplateResponse("trainersignup.html", {
@@ -201,7 +244,7 @@ async def trainer_signup(request: Request, form_data: TrainerSignUpForm = Depend
         })
 
     # Hash the password for security
-    hashed_password = hashpw(form_data.password.encode(), gensalt())
+    hashed_password = await hash_password_async(form_data.password)
 
     # Create new trainer instance
     new_trainer = Trainer(
@@ -211,7 +254,7 @@ async def trainer_signup(request: Request, form_data: TrainerSignUpForm = Depend
         date_of_birth=form_data.date_of_birth,
         username=form_data.username,
         email=form_data.email,
-        password=hashed_password.decode(),
+        password=hashed_password,
         specialties=form_data.specialties,  
         experience=form_data.experience,
         contact_number=form_data.contact_number,
@@ -220,59 +263,196 @@ async def trainer_signup(request: Request, form_data: TrainerSignUpForm = Depend
     )
 
     db.add(new_trainer)
-    db.commit()
-    db.refresh(new_trainer)
+    await db.commit()
+    await db.refresh(new_trainer)
+    invalidate_principal("trainer", new_trainer.username)
 
     # Redirect to login page after successful signup
     return RedirectResponse(url="/trainer/login", status_code=302)
 
 @router.get("/trainer/logout")
-async def logout_trainer(response: Response):
+async def logout_trainer(request: Request, response: Response):
     # Remove the trainer's JWT token
+    principal_cache.pop(request.cookies.get("trainer_access_token"))
     response = RedirectResponse(url="/", status_code=302)
     response.delete_cookie(key="trainer_access_token")
     return response
 
+# Columns a trainer may request from the athlete list, by their public name
+ATHLETE_LIST_FIELDS = {
+    "id": Athlete.id,
+    "first_name": Athlete.first_name,
+    "last_name": Athlete.last_name,
+    "email": Athlete.email,
+    "gender": Athlete.gender,
+    "age": Athlete.age,
+    "date_of_birth": Athlete.date_of_birth,
+    "body_weight": Athlete.body_weight,
+    "height": Athlete.Height,
+    "bmr": Athlete.bmr,
+    "hydration_level": Athlete.hydration_level,
+    "muscle_mass": Athlete.muscle_mass,
+    "sports_playing": Athlete.sports_playing,
+    "position": Athlete.position,
+    "training_goal": Athlete.training_goal,
+    "injury_history": Athlete.injury_history,
+    "medical_condition": Athlete.medical_condition,
+    "allergies": Athlete.allergies,
+    "registration_date": Athlete.registration_date,
+    "version": Athlete.version,
+}
+DEFAULT_ATHLETE_LIST_FIELDS = [
+    "id", "first_name", "last_name", "body_weight", "bmr", "age",
+    "hydration_level", "muscle_mass", "gender", "date_of_birth",
+]
+ATHLETE_PAGE_SIZE_LIMIT = 500
+
+
 # Endpoint for trainers to view a list of athletes data
-@router.get("/athletes", response_class=JSONResponse)
+@router.get("/athletes", response_class=JSONResponse, response_model=RosterPage)
 async def list_athletes(
-    db: Session = Depends(get_db),
+    after: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    limit: int = Query(50, ge=1, le=ATHLETE_PAGE_SIZE_LIMIT),
+    fields: Optional[str] = Query(None, description="Comma separated list of fields to return"),
+    filters: List[str] = Query([], alias="filter", description="Repeatable field:operator[:value] filter, e.g. age:gte:18 or bmr:null"),
+    sort: Optional[str] = Query(None, description="Field to sort by, prefixed with - for descending"),
+    stream: bool = Query(False, description="Stream every athlete after the cursor instead of one page"),
+    unassigned: bool = Query(False, description="List athletes without a trainer instead of your roster"),
+    db: AsyncSession = Depends(get_db),
     current_user: Trainer = Depends(get_current_trainer)
 ):
-    # Fetch all athletes from the database
-    athletes = db.query(Athlete).all()
+    # Resolve the requested projection; id and the sort field are always included for the cursor
+    field_names = DEFAULT_ATHLETE_LIST_FIELDS
+    if fields:
+        field_names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in field_names if name not in ATHLETE_LIST_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        if "id" not in field_names:
+            field_names = ["id"] + field_names
+
+    # Keyset query over the trainer's roster: only the selected columns, filtered and sorted as asked
+    roster_owner = None if unassigned else current_user.id
+    try:
+        query, sort_field = roster_select(roster_owner, filters, sort, after)
+    except RosterQueryError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if sort_field not in field_names:
+        field_names = field_names + [sort_field]
+    query = query.add_columns(*(ATHLETE_LIST_FIELDS[name] for name in field_names))
+
+    if stream:
+        return StreamingResponse(stream_athlete_rows(query, field_names), media_type="application/json")
+
+    rows = (await db.execute(query.limit(limit + 1))).all()
 
-    if not athletes:
+    if not rows and after is None and not filters:
         return JSONResponse(content={"error": "No athletes found"}, status_code=404)
 
-    # Prepare the response data for all athletes
-    athlete_list = []
-    for athlete in athletes:
-        athlete_data = {
-            "first_name": athlete.first_name,
-            "last_name": athlete.last_name,
-            "body_weight": athlete.body_weight,
-            # "height": athlete.height,
-            "bmr": athlete.bmr,
-            "age": athlete.age,
-            "hydration_level": athlete.hydration_level,
-            "muscle_mass": athlete.muscle_mass,
-            "residence": athlete.residence,
-            "gender": athlete.gender,
-            "date_of_birth": athlete.date_of_birth.strftime("%Y-%m-%d")
-        }
-        athlete_list.append(athlete_data)
-
-    return JSONResponse(content={"athletes": athlete_list}, status_code=200)
+    # One extra row tells us whether another page exists
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = next_cursor_for(rows[-1], field_names, sort_field)
+
+    return Response(content=dump_roster_page(rows, field_names, next_cursor), media_type="application/json")
+
+
+# Write the athlete list as one JSON document, a row at a time
+async def stream_athlete_rows(query, field_names):
+    yield b'{"athletes":['
+    async with session_scope() as db:
+        result = await db.stream(query)
+        first = True
+        async for row in result:
+            yield dump_athlete_row(row, field_names) if first else b"," + dump_athlete_row(row, field_names)
+            first = False
+    yield b'],"next_cursor":null}'
+
+# Request body for moving athletes between rosters
+class RosterAssignment(BaseModel):
+    athlete_ids: List[int]
+    trainer_id: Optional[int] = None  # Defaults to the trainer making the request
+
+
+# Bulk assign unassigned athletes, or reassign athletes from your roster, to a trainer
+@router.put("/trainer/roster", response_class=JSONResponse)
+async def assign_roster(
+    assignment: RosterAssignment,
+    db: AsyncSession = Depends(get_db),
+    current_trainer: Trainer = Depends(get_current_trainer)
+):
+    target_id = assignment.trainer_id or current_trainer.id
+    if target_id != current_trainer.id and not await db.get(Trainer, target_id):
+        raise HTTPException(status_code=404, detail="Trainer not found")
+
+    moved = await move_athletes(db, assignment.athlete_ids, current_trainer.id, target_id)
+    return {"updated": sorted(moved), "skipped": sorted(set(assignment.athlete_ids) - set(moved))}
+
+
+# Bulk release athletes from your roster
+@router.delete("/trainer/roster", response_class=JSONResponse)
+async def release_roster(
+    assignment: RosterAssignment,
+    db: AsyncSession = Depends(get_db),
+    current_trainer: Trainer = Depends(get_current_trainer)
+):
+    moved = await move_athletes(db, assignment.athlete_ids, current_trainer.id, None)
+    return {"updated": sorted(moved), "skipped": sorted(set(assignment.athlete_ids) - set(moved))}
+
+
+# One UPDATE for the whole batch; a trainer may claim unassigned athletes and move or release their own
+async def move_athletes(db: AsyncSession, athlete_ids: List[int], trainer_id: int, target_id: Optional[int]) -> List[int]:
+    if not athlete_ids:
+        return []
+
+    movable = Athlete.trainer_id == trainer_id
+    if target_id is not None:
+        movable = or_(Athlete.trainer_id.is_(None), movable)
+
+    result = await db.execute(
+        update(Athlete)
+        .where(Athlete.id.in_(athlete_ids), movable)
+        .values(trainer_id=target_id)
+        .returning(Athlete.id, Athlete.username)
+        .execution_options(synchronize_session=False)
+    )
+    moved = result.all()
+    await db.commit()
+
+    invalidate_principal("athlete", *(row.username for row in moved))
+    invalidate_analytics()
+    return [row.id for row in moved]
+
+
+SEARCH_RESULT_LIMIT = 100
+
+
+# Ranked type-ahead search over the trainer's roster
+@router.get("/trainer/athletes/search", response_class=JSONResponse)
+async def search_roster(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=SEARCH_RESULT_LIMIT),
+    unassigned: bool = Query(False, description="Search athletes without a trainer instead of your roster"),
+    db: AsyncSession = Depends(get_db),
+    current_trainer: Trainer = Depends(get_current_trainer)
+):
+    results = await search_athletes(db, q, None if unassigned else current_trainer.id, limit)
+    return {"results": results}
+
 
 # Endpoint for athletes and trainers to view athlete data
-@router.get("/athlete/{athlete_id}", response_class=JSONResponse)
+@router.get("/athlete/{athlete_id}", response_class=JSONResponse, response_model=AthleteProfile)
 async def get_athlete(
     athlete_id: int,
-    db: Session = Depends(get_db), 
+    request: Request,
+    db: AsyncSession = Depends(get_db), 
     current_user: Athlete = Depends(get_current_athlete) 
 ):
-    athlete = db.query(Athlete).filter_by(id=athlete_id).first()
+    # The profile columns plus the validators, as one tuple
+    athlete = (await db.execute(
+        select(*model_columns(AthleteProfile, Athlete), Athlete.version, Athlete.updated_at).where(Athlete.id == athlete_id)
+    )).first()
 
     if not athlete:
         return JSONResponse(content={"error": "Athlete not found"}, status_code=404)
@@ -280,43 +460,33 @@ async def get_athlete(
     if current_user.id != athlete.id:
         return JSONResponse(content={"error": "Unauthorized"}, status_code=401)
 
-    return {
-        "id": athlete.id,
-        "first_name": athlete.first_name,
-        "last_name": athlete.last_name,
-        "date_of_birth": athlete.date_of_birth,
-        "email": athlete.email,
-        "body_weight": athlete.body_weight,
-        #"height": athlete.height,
-        "bmr": athlete.bmr,
-        "age": athlete.age,
-        "hydration_level": athlete.hydration_level,
-        "muscle_mass": athlete.muscle_mass,
-        "residence": athlete.residence,
-        "gender": athlete.gender,
-    }
-
-# Define the Pydantic model for the request body
-class AthleteUpdate(BaseModel):
-    body_weight: Optional[float] = None
-    bmr: Optional[float] = None
-    hydration_level: Optional[float] = None
-    muscle_mass: Optional[float] = None
+    # Unchanged since the client's copy: answer from the row version alone
+    headers = validator_headers(athlete_etag(athlete, "json"), athlete.updated_at)
+    if is_not_modified(request, headers["ETag"], athlete.updated_at):
+        return not_modified(headers)
 
+    return Response(content=dump_model_row(AthleteProfile, athlete), media_type="application/json", headers=headers)
 
 # Endpoint for updating athlete's data
-@router.put("/athlete/{athlete_id}", response_class=JSONResponse)
+@router.put("/athlete/{athlete_id}", response_class=JSONResponse, response_model=AthleteStatsUpdated)
 async def update_athlete(
     athlete_id: int,
     athlete_data: AthleteUpdate,  # Pydantic model for validation
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_trainer: Trainer = Depends(get_current_trainer)  # Authenticate the trainer
 ):
-    athlete = db.query(Athlete).filter_by(id=athlete_id).first()
+    athlete = await db.get(Athlete, athlete_id)
 
-    if not athlete:
+    # Another trainer's athlete is answered as if it did not exist
+    if not athlete or athlete.trainer_id != current_trainer.id:
         raise HTTPException(status_code=404, detail="Athlete not found")
 
+    # Fields whose value actually changes, pushed to live subscribers after the commit
+    changes = {
+        name: value for name, value in athlete_data.model_dump().items()
+        if value is not None and value != getattr(athlete, name)
+    }
+
     # Update athlete's data with the provided information
     if athlete_data.body_weight is not None:
         athlete.body_weight = athlete_data.body_weight
@@ -327,173 +497,421 @@ async def update_athlete(
     if athlete_data.muscle_mass is not None:
         athlete.muscle_mass = athlete_data.muscle_mass
 
+    # Keep the reading in the metric history
+    await record_measurements(db, athlete.id, athlete_data.model_dump())
+
 # Save changes to the database
-    db.commit()
-    db.refresh(athlete)
+    await db.commit()
+    await db.refresh(athlete)
+    invalidate_principal("athlete", athlete.username)
+    invalidate_analytics()
+    live_hub.publish(athlete.id, athlete.version, changes)
+
+    payload = AthleteStatsUpdated(
+        message="Athlete updated successfully",
+        athlete=AthleteStats.model_validate(athlete, from_attributes=True),
+    )
+    return Response(content=payload.model_dump_json(), media_type="application/json")
+
+# Request body item for the batch athlete update
+class AthleteEdit(BaseModel):
+    id: int
+    fields: AthleteUpdate
+    version: Optional[int] = None  # The version the client read; the edit is refused if the row has moved on
+
+
+ATHLETE_BATCH_LIMIT = 500
+ATHLETE_EDIT_COLUMNS = {name: getattr(Athlete, name) for name in AthleteUpdate.model_fields}
+
+
+# Apply stats edits to many athletes on your roster in one transaction, with a result per edit
+@router.patch("/athletes", response_class=JSONResponse, response_model=AthleteBatchResult)
+async def update_athletes(
+    edits: List[AthleteEdit],
+    atomic: bool = Query(False, description="Apply nothing unless every edit can be applied"),
+    db: AsyncSession = Depends(get_db),
+    current_trainer: Trainer = Depends(get_current_trainer)
+):
+    if len(edits) > ATHLETE_BATCH_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {ATHLETE_BATCH_LIMIT} edits per request")
+
+    # The rows as they are now, for the trainer's own roster only
+    current = {row.id: row for row in (await db.execute(
+        select(Athlete.id, Athlete.version, Athlete.username, *ATHLETE_EDIT_COLUMNS.values())
+        .where(Athlete.id.in_(sorted({edit.id for edit in edits})), Athlete.trainer_id == current_trainer.id)
+    )).all()}
+
+    # Classify every edit against what was read; only rows whose values differ need writing
+    results: List[AthleteEditResult] = []
+    readings: Dict[int, dict] = {}
+    changes: Dict[int, dict] = {}
+    seen = set()
+    for edit in edits:
+        row = current.get(edit.id)
+        if edit.id in seen:
+            status = "duplicate"
+        elif row is None:
+            status = "not_found"
+        elif edit.version is not None and edit.version != row.version:
+            status = "conflict"
+        else:
+            readings[edit.id] = edit.fields.model_dump(exclude_none=True)
+            changed = {name: value for name, value in readings[edit.id].items() if value != getattr(row, name)}
+            if changed:
+                changes[edit.id] = changed
+            status = "updated" if changed else "unchanged"
+        seen.add(edit.id)
+        results.append(AthleteEditResult(id=edit.id, status=status, version=row.version if row is not None and status != "duplicate" else None))
+
+    # One UPDATE for the whole batch: each column takes its new value by id, and a row only
+    # matches at the version just read, so a write that landed since is a conflict, not lost
+    applied: Dict[int, int] = {}
+    failed = any(result.status in ("conflict", "not_found", "duplicate") for result in results)
+    if changes and not (atomic and failed):
+        values = {}
+        for name, column in ATHLETE_EDIT_COLUMNS.items():
+            new_values = {athlete_id: changed[name] for athlete_id, changed in changes.items() if name in changed}
+            if new_values:
+                values[name] = case(new_values, value=Athlete.id, else_=column)
+        applied = dict((await db.execute(
+            update(Athlete)
+            .where(
+                Athlete.id.in_(list(changes)),
+                tuple_(Athlete.id, Athlete.version).in_([(athlete_id, current[athlete_id].version) for athlete_id in changes]),
+                Athlete.trainer_id == current_trainer.id,
+            )
+            .values(values)
+            .returning(Athlete.id, Athlete.version)
+            .execution_options(synchronize_session=False)
+        )).all())
+        for result in results:
+            if result.status == "updated":
+                if result.id in applied:
+                    result.version = applied[result.id]
+                else:
+                    result.status, result.version = "conflict", None
+                    failed = True
+
+    # All or nothing: report what blocked the batch and keep none of it
+    if atomic and failed:
+        await db.rollback()
+        for result in results:
+            if result.status in ("updated", "unchanged"):
+                result.status = "skipped"
+        payload = AthleteBatchResult(results=results, updated=0, conflicts=sum(result.status == "conflict" for result in results))
+        return Response(content=payload.model_dump_json(), media_type="application/json", status_code=409)
+
+    # Keep the readings in the metric history, including values that did not change
+    accepted = {result.id for result in results if result.status in ("updated", "unchanged")}
+    await record_measurement_batch(db, {athlete_id: values for athlete_id, values in readings.items() if athlete_id in accepted})
+    await db.commit()
+
+    if applied:
+        invalidate_principal("athlete", *(current[athlete_id].username for athlete_id in applied))
+        invalidate_analytics()
+        for athlete_id, version in applied.items():
+            live_hub.publish(athlete_id, version, changes[athlete_id])
+
+    payload = AthleteBatchResult(
+        results=results,
+        updated=len(applied),
+        conflicts=sum(result.status == "conflict" for result in results),
+    )
+    return Response(content=payload.model_dump_json(), media_type="application/json")
+
+HISTORY_MAX_POINTS = 2000
+
+
+# Endpoint for an athlete, or their trainer, to read metric history over a time range
+@router.get("/athlete/{athlete_id}/history", response_class=JSONResponse)
+async def athlete_history(
+    athlete_id: int,
+    metric: Optional[List[str]] = Query(None, description="Metrics to return; defaults to all"),
+    start: Optional[datetime] = Query(None, description="Defaults to one year before end"),
+    end: Optional[datetime] = Query(None, description="Defaults to now"),
+    points: int = Query(300, ge=1, le=HISTORY_MAX_POINTS, description="Maximum buckets per metric"),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_principal)
+):
+    role, principal = current_user
+    if role == "athlete" and principal.id != athlete_id:
+        return JSONResponse(content={"error": "Unauthorized"}, status_code=401)
+    if role == "trainer":
+        trainer_id = await db.scalar(select(Athlete.trainer_id).where(Athlete.id == athlete_id))
+        if trainer_id != principal.id:
+            return JSONResponse(content={"error": "Athlete not found"}, status_code=404)
+
+    metrics = metric or list(METRIC_CODES)
+    unknown = [name for name in metrics if name not in METRIC_CODES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown)}")
+
+    # Naive datetimes are taken as UTC
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=365)
+    end, start = (value if value.tzinfo else value.replace(tzinfo=timezone.utc) for value in (end, start))
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    history = await downsampled_history(db, athlete_id, metrics, start, end, points)
+    return {"athlete_id": athlete_id, "start": start.isoformat(), "end": end.isoformat(), "metrics": history}
+
+
+INGEST_BATCH_SIZE = 1000
+INGEST_MAX_REPORTED_ERRORS = 1000
+
+
+# Endpoint for trainers to upload a session's readings as CSV or NDJSON
+# (columns: athlete_id, metric, value and an optional ISO time)
+@router.post("/trainer/measurements/upload", response_class=JSONResponse)
+async def upload_measurements(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_trainer: Trainer = Depends(get_current_trainer)
+):
+    records = iter_records(file.file, file.filename, file.content_type)
+    uploaded_at = int(datetime.now(timezone.utc).timestamp())
+    report = {"rows": 0, "applied": 0, "error_count": 0, "errors": []}
+
+    def add_errors(errors):
+        report["error_count"] += len(errors)
+        room = INGEST_MAX_REPORTED_ERRORS - len(report["errors"])
+        report["errors"].extend(errors[:max(room, 0)])
+
+    while True:
+        # The upload is spooled to disk; read it a batch at a time off the event loop
+        batch = await run_in_threadpool(next_batch, records, INGEST_BATCH_SIZE)
+        if not batch:
+            break
+        report["rows"] += len(batch)
+
+        rows, errors = validate_batch(batch)
+
+        # Only athletes on this trainer's roster can receive readings
+        roster = dict((await db.execute(
+            select(Athlete.id, Athlete.username).where(
+                Athlete.id.in_([row.athlete_id for _, row in rows]),
+                Athlete.trainer_id == current_trainer.id,
+            )
+        )).all())
+        errors.extend(
+            {"row": line_number, "error": "Athlete not found on your roster"}
+            for line_number, row in rows if row.athlete_id not in roster
+        )
+        add_errors(sorted(errors, key=lambda error: error["row"]))
+
+        readings = [
+            (row.athlete_id, row.metric, row.value, row.timestamp(uploaded_at))
+            for _, row in rows if row.athlete_id in roster
+        ]
+        await apply_measurement_batch(db, readings)
+        await db.commit()
+        report["applied"] += len(readings)
+
+        invalidate_principal("athlete", *{roster[reading[0]] for reading in readings})
+        invalidate_analytics()
+
+    return report
+
+
+# Endpoint for trainers to summarize their roster's numbers by sport and position
+@router.get("/trainer/analytics", response_class=JSONResponse)
+async def trainer_analytics(
+    group_by: List[str] = Query(["sports_playing", "position"], description="Columns to group by"),
+    metric: Optional[List[str]] = Query(None, description="Metrics to summarize; defaults to all"),
+    below: Optional[List[str]] = Query(None, description="Thresholds as metric:value, e.g. hydration_level:55"),
+    db: AsyncSession = Depends(get_db),
+    current_trainer: Trainer = Depends(get_current_trainer)
+):
+    metrics = metric or list(ANALYTICS_METRICS)
+    unknown = [name for name in group_by if name not in ANALYTICS_GROUPS] + [name for name in metrics if name not in ANALYTICS_METRICS]
+
+    thresholds = {}
+    for item in below or []:
+        name, _, limit = item.partition(":")
+        try:
+            thresholds[name] = float(limit)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid threshold: {item}")
+        if name not in ANALYTICS_METRICS:
+            unknown.append(name)
+        elif name not in metrics:
+            metrics.append(name)
+
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    group_by = list(dict.fromkeys(group_by))
+    groups = await roster_analytics(db, current_trainer.id, group_by, metrics, thresholds)
+    return {"group_by": group_by, "groups": groups}
+
+
+# Endpoint for athletes and trainers to upload their own profile photo (multipart field "photo")
+@router.post("/photo", response_class=JSONResponse)
+async def upload_photo(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    principal = Depends(get_current_principal)
+):
+    role, user = principal
+    try:
+        digest = await store_photo(request)
+    except PhotoError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+
+    model = Athlete if role == "athlete" else Trainer
+    await db.execute(
+        update(model).where(model.id == user.id).values(photo=digest).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    invalidate_principal(role, user.username)
 
     return {
-        "message": "Athlete updated successfully",
-        "athlete": {
-            "first_name": athlete.first_name,
-            "last_name": athlete.last_name,
-            "body_weight": athlete.body_weight,
-            "bmr": athlete.bmr,
-            "age": athlete.age,
-            "hydration_level": athlete.hydration_level,
-            "muscle_mass": athlete.muscle_mass,
-            "residence": athlete.residence,
-            "gender": athlete.gender,
-            "date_of_birth": athlete.date_of_birth
-        }
+        "photo": digest,
+        "thumbnails": {size: photo_url(digest, size) for size in settings.PHOTO_THUMBNAIL_SIZES},
     }
 
+
+# Stored photos by content digest: a thumbnail size or "original"
+@router.get("/photos/{digest}/{variant}", response_class=Response)
+async def get_photo(digest: str, variant: str, request: Request, principal = Depends(get_current_principal)):
+    found = await run_in_threadpool(find_photo_file, digest, variant)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    path, media_type = found
+    return photo_response(request, path, media_type, f'"{digest}-{variant}"')
+
+
+# Live updates for one athlete: their own dashboard, or a trainer watching a roster athlete
+@router.websocket("/ws/athlete/{athlete_id}")
+async def athlete_updates(websocket: WebSocket, athlete_id: int):
+    # Authorize up front; no session is held while the connection idles
+    async with session_scope() as db:
+        allowed = await can_watch_athlete(websocket, athlete_id, db)
+    if not allowed:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    await stream_athlete_updates(websocket, athlete_id)
+
+
+async def can_watch_athlete(websocket: WebSocket, athlete_id: int, db: AsyncSession) -> bool:
+    for role_type in ("athlete", "trainer"):
+        if not websocket.cookies.get(TOKEN_COOKIES[role_type]):
+            continue
+        try:
+            principal = await resolve_principal(websocket, role_type, db)
+        except HTTPException:
+            continue
+        if role_type == "athlete" and principal.id == athlete_id:
+            return True
+        if role_type == "trainer" and await db.scalar(select(Athlete.trainer_id).where(Athlete.id == athlete_id)) == principal.id:
+            return True
+    return False
+
+
 # Endpoint for Athlete dashboard
 @router.get("/dashboard", response_class=HTMLResponse)
-async def athlete_dashboard(request: Request, db: Session = Depends(get_db)):
-    access_token = request.cookies.get("athlete_access_token")
-    
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Unauthorized: No token found")
-    
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        
-        username: str = payload.get("sub")
-        role: str = payload.get("role")
-        
-        if username is None or role != "athlete":
-            raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    except JWTError as e:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    # Fetch the current athlete's data based on the username in the token
-    athlete = db.query(Athlete).filter(Athlete.username == username).first()
-    if not athlete:
-        raise HTTPException(status_code=404, detail="Athlete not found")
+async def athlete_dashboard(request: Request, athlete: Athlete = Depends(get_current_athlete)):
+    # Skip rendering when the athlete and the template are both unchanged
+    revision = source_revision(os.path.join(TEMPLATE_DIR, "dashboard.html"))
+    headers = validator_headers(athlete_etag(athlete, "dashboard", revision), athlete.updated_at)
+    if is_not_modified(request, headers["ETag"], athlete.updated_at):
+        return not_modified(headers)
 
     # Render the dashboard HTML template for athletes
-    return templates.TemplateResponse("dashboard.html", {"request": request, "athlete": athlete})
+    return templates.TemplateResponse("dashboard.html", {"request": request, "athlete": athlete}, headers=headers)
 
 @router.get("/download-stats", response_class=Response)
-async def download_stats(request: Request, db: Session = Depends(get_db), current_athlete: Athlete = Depends(get_current_athlete)):
-    athlete = db.query(Athlete).filter(Athlete.id == current_athlete.id).first() 
-    # Create a PDF buffer in memory
-    buffer = BytesIO()
-
-    # Create the PDF object, using the buffer as its "file."
-    pdf = canvas.Canvas(buffer, pagesize=letter)
-
-    # Set title and general formatting
-    pdf.setTitle("Athlete Stats")
-    pdf.setFont("Helvetica-Bold", 16)
-    pdf.drawString(200, 750, "Athlete Stats Summary")
-
-    pdf.line(50, 740, 550, 740)
-    pdf.setFont("Helvetica", 12)
-    y = 710
-
-     # Define a list of all attributes and their corresponding labels
-    attributes = [
-        ("First Name", athlete.first_name),
-        ("Last Name", athlete.last_name),
-        ("Date of Birth", athlete.date_of_birth),
-        ("Age", athlete.age),
-        ("Gender", athlete.gender),
-        ("Address", athlete.address or "Not Set"),
-        ("Contact Number", athlete.contact_number or "Not Set"),
-        ("Emergency Contact", athlete.emergency_contact or "Not Set"),
-        ("Emergency Contact Number", athlete.emergency_contact_number or "Not Set"),
-        ("Sports Playing", athlete.sports_playing or "Not Set"),
-        ("Position", athlete.position or "Not Set"),
-        ("Email", athlete.email),
-        ("Body Weight", athlete.body_weight or "Not Set"),
-        ("BMR", athlete.bmr or "Not Set"),
-        ("Hydration Level", athlete.hydration_level or "Not Set"),
-        ("Muscle Mass", athlete.muscle_mass or "Not Set"),
-        ("Injury History", athlete.injury_history or "None"),
-        ("Medical Condition", athlete.medical_condition or "None"),
-        ("Allergies", athlete.allergies or "None"),
-        ("Training Goal", athlete.training_goal or "Not Set"),
-    ]
-
-    # Loop through each attribute and print it in the PDF
-    for label, value in attributes:
-        pdf.drawString(100, y, f"{label}: {value}")
-        y -= 20  # Move down for the next line
-        if y < 100:  # If the page is full, add a new page
-            pdf.showPage()
-            pdf.setFont("Helvetica", 12)
-            y = 750  # Reset y-coordinate
-
-    # Adding a footer
-    pdf.setFont("Helvetica-Oblique", 10)
-    pdf.drawString(250, 50, "Generated by StatSync")
-    
-    # Finalize the PDF
-    pdf.showPage()
-    pdf.save()
+async def download_stats(request: Request, current_athlete: Athlete = Depends(get_current_athlete)):
+    # The client's copy is current: no render and no cache lookup
+    headers = validator_headers(athlete_etag(current_athlete, "pdf", pdf_revision()), current_athlete.updated_at)
+    if is_not_modified(request, headers["ETag"], current_athlete.updated_at):
+        return not_modified(headers)
 
-    # Get the PDF data from the buffer
-    pdf_data = buffer.getvalue()
-    buffer.close()
+    # Rendered on the PDF worker pool, or served from the cache when the stats are unchanged
+    pdf_data, cached = await athlete_stats_pdf(current_athlete)
 
     # Return the PDF as a downloadable file
-    headers = {
-        'Content-Disposition': 'attachment; filename="athlete_stats.pdf"'
-    }
+    headers.update({
+        'Content-Disposition': 'attachment; filename="athlete_stats.pdf"',
+        'X-Cache': 'HIT' if cached else 'MISS',
+    })
     return Response(content=pdf_data, media_type="application/pdf", headers=headers)
 
-# Trainer Dashboard Route endpoint 
-@router.get("/trainer/dashboard", response_class=HTMLResponse)
-async def trainer_dashboard(request: Request, db: Session = Depends(get_db), current_trainer = Depends(get_current_trainer)):
-    access_token = request.cookies.get("trainer_access_token")
-    
-    if not access_token:
-        raise HTTPException(status_code=401, detail="Unauthorized: No token found")
-  
-    try:
-        # Decode the JWT token from the cookie
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        
-        # Extract the username and role from the token payload
-        username: str = payload.get("sub")
-        role: str = payload.get("role")
-        
-        # Ensure the role is "trainer"
-        if username is None or role != "trainer":
-            raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    except JWTError as e:
-        raise HTTPException(status_code=401, detail="Invalid token")
+# Endpoint for trainers to export a stats PDF for every athlete on their roster as one ZIP
+@router.get("/trainer/roster/export", response_class=StreamingResponse)
+async def export_roster(current_trainer: Trainer = Depends(get_current_trainer)):
+    headers = {'Content-Disposition': 'attachment; filename="roster_stats.zip"'}
+    return StreamingResponse(stream_roster_zip(current_trainer.id), media_type="application/zip", headers=headers)
 
-    # Fetch the current trainer's data based on the username from the token
-    trainer = db.query(Trainer).filter(Trainer.username == username).first()
-    if not trainer:
-        raise HTTPException(status_code=404, detail="Trainer not found")
 
-    # Fetch the list of athletes for the trainer to view and manage
-    athletes = db.query(Athlete).all()
+# Athletes are read from their own session, since the body is produced after the handler returns
+async def stream_roster_zip(trainer_id: int):
+    async with session_scope() as db:
+        result = await db.stream(
+            select(Athlete)
+            .where(Athlete.trainer_id == trainer_id)
+            .order_by(Athlete.last_name, Athlete.first_name)
+        )
+        athletes = (row[0] async for row in result)
+        async for chunk in stream_stats_zip(athletes, window=settings.PDF_WORKERS * 2):
+            yield chunk
+
 
-    # Render the trainer dashboard template with the trainer's and athletes' data
-    return templates.TemplateResponse("trainer_dashboard.html", {
+# Athletes with no trainer offered on the dashboard to claim; PUT /trainer/roster takes any number
+UNASSIGNED_DASHBOARD_LIMIT = 100
+
+# Trainer Dashboard Route endpoint 
+@router.get("/trainer/dashboard", response_class=HTMLResponse)
+async def trainer_dashboard(request: Request, current_trainer = Depends(get_current_trainer)):
+    # Rendered while the roster is read, so the page starts arriving before the last athlete is fetched
+    return stream_template(streaming_environment, "trainer_dashboard.html", {
         "request": request,
         "trainer": current_trainer,
-        "athletes": athletes
+        "athletes": stream_roster(current_trainer.id),
+        "unassigned": stream_roster(None, limit=UNASSIGNED_DASHBOARD_LIMIT),
+        "unassigned_limit": UNASSIGNED_DASHBOARD_LIMIT,
     })
 
+
+# Claim the athletes ticked in the dashboard's unassigned list
+@router.post("/trainer/roster/claim")
+async def claim_athletes(
+    athlete_ids: List[int] = Form([]),
+    db: AsyncSession = Depends(get_db),
+    current_trainer: Trainer = Depends(get_current_trainer)
+):
+    await move_athletes(db, athlete_ids, current_trainer.id, current_trainer.id)
+    return RedirectResponse(url="/trainer/dashboard", status_code=302)
+
+
+# A roster (or the unassigned athletes, for None) as it comes from the database,
+# with only the columns the dashboard shows
+async def stream_roster(trainer_id: Optional[int], limit: Optional[int] = None):
+    query = (
+        select(Athlete.id, Athlete.first_name, Athlete.last_name, Athlete.email, Athlete.photo)
+        .where(Athlete.trainer_id.is_(None) if trainer_id is None else Athlete.trainer_id == trainer_id)
+        .order_by(Athlete.last_name, Athlete.first_name)
+        .limit(limit)
+    )
+    async with session_scope() as db:
+        async for row in await db.stream(query):
+            yield row
+
 # Route for trainers to view and update specific athlete information
 @router.get("/trainer/athlete/{athlete_id}", response_class=HTMLResponse)
 async def view_athlete(
     athlete_id: int, 
     request: Request, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_db), 
     current_trainer: Trainer = Depends(get_current_trainer)
 ):
     # Fetch the athlete by ID
-    athlete = db.query(Athlete).filter(Athlete.id == athlete_id).first()
+    athlete = await db.get(Athlete, athlete_id)
 
-    if not athlete:
+    if not athlete or athlete.trainer_id != current_trainer.id:
         raise HTTPException(status_code=404, detail="Athlete not found")
 
     # Return the template for viewing/updating athlete information
@@ -509,26 +927,40 @@ async def update_athlete(
     first_name: str = Form(...),
     last_name: str = Form(...),
     email: str = Form(...),
-    body_weight: float = Form(None),
-    bmr: float = Form(None),
-    hydration_level: float = Form(None),
-    muscle_mass: float = Form(None),
+    body_weight: float = Form(None, allow_inf_nan=False),
+    bmr: float = Form(None, allow_inf_nan=False),
+    hydration_level: float = Form(None, allow_inf_nan=False),
+    muscle_mass: float = Form(None, allow_inf_nan=False),
     injury_history: str = Form(None),
     medical_condition: str = Form(None),
     allergies: str = Form(None),
     sports_playing: str = Form(None),
     position: str = Form(None),
     training_goal: str = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_trainer = Depends(get_current_trainer)
 ):
-    print("POST request received for athlete:", athlete_id)  
+    logger.debug("POST request received for athlete: %s", athlete_id)
     # Fetch the athlete by ID
-    athlete = db.query(Athlete).filter(Athlete.id == athlete_id).first()
+    athlete = await db.get(Athlete, athlete_id)
 
-    if not athlete:
+    if not athlete or athlete.trainer_id != current_trainer.id:
         raise HTTPException(status_code=404, detail="Athlete not found")
 
+    # Record metric readings that differ from the stored values
+    readings = {"body_weight": body_weight, "bmr": bmr, "hydration_level": hydration_level, "muscle_mass": muscle_mass}
+    await record_measurements(db, athlete.id, {
+        name: value for name, value in readings.items() if value != getattr(athlete, name)
+    })
+
+    submitted = {
+        "first_name": first_name, "last_name": last_name, "email": email,
+        "body_weight": body_weight, "bmr": bmr, "hydration_level": hydration_level, "muscle_mass": muscle_mass,
+        "injury_history": injury_history, "medical_condition": medical_condition, "allergies": allergies,
+        "sports_playing": sports_playing, "position": position, "training_goal": training_goal,
+    }
+    changes = {name: value for name, value in submitted.items() if value != getattr(athlete, name)}
+
     # Update athlete's information
     athlete.first_name = first_name
     athlete.last_name = last_name
@@ -545,7 +977,10 @@ async def update_athlete(
     athlete.training_goal = training_goal
 
     # Commit changes to the database
-    db.commit()
+    await db.commit()
+    invalidate_principal("athlete", athlete.username)
+    invalidate_analytics()
+    live_hub.publish(athlete.id, athlete.version, changes)
 
     # Redirect back to the trainer's dashboard after the update
     return RedirectResponse(url="/trainer/dashboard", status_code=302)
@@ -554,19 +989,22 @@ async def update_athlete(
 @router.post("/trainer/athlete/{athlete_id}/delete")
 async def delete_athlete(
     athlete_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_trainer: Trainer = Depends(get_current_trainer)
 ):
     # Fetch the athlete by ID
-    athlete = db.query(Athlete).filter(Athlete.id == athlete_id).first()
+    athlete = await db.get(Athlete, athlete_id)
 
     # Check if the athlete exists
-    if not athlete:
+    if not athlete or athlete.trainer_id != current_trainer.id:
         raise HTTPException(status_code=404, detail="Athlete not found")
 
-    # Delete the athlete from the database
-    db.delete(athlete)
-    db.commit()
+    # Delete the athlete and their metric history from the database
+    await db.execute(delete(Measurement).where(Measurement.athlete_id == athlete.id))
+    await db.delete(athlete)
+    await db.commit()
+    invalidate_principal("athlete", athlete.username)
+    invalidate_analytics()
 
     # Redirect back to the trainer's dashboard after deletion
     return RedirectResponse(url="/trainer/dashboard", status_code=302)
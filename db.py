@@ -1,19 +1,158 @@
-from sqlalchemy import create_engine
-from typing import Generator
+from sqlalchemy import create_engine, event, inspect
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Generator
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 
-DATABASE_URL = "sqlite:///./StatsyncDB.db"
+from config import settings
+
+DATABASE_URL = settings.DATABASE_URL
+# Same database, driven through aiosqlite for the async request path
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args={"check_same_thread": False})
+# Objects stay usable after commit; lazy refreshes are not possible on an AsyncSession
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-# Dependency for getting the database session
-def get_db() -> Generator[Session, None, None]:
+
+# Pragmas making up the SQLite connection profile
+def sqlite_pragmas() -> list:
+    return [
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA foreign_keys={'ON' if settings.SQLITE_FOREIGN_KEYS else 'OFF'}",
+    ]
+
+
+def apply_sqlite_profile(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+if settings.SQLITE_PRAGMAS and DATABASE_URL.startswith("sqlite"):
+    event.listen(engine, "connect", apply_sqlite_profile)
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_profile)
+
+
+# create_all skips columns added to tables that already exist; add them in place
+def add_missing_columns(connection, metadata) -> None:
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            # SQLite only allows NOT NULL on an added column when it has a constant default
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}"
+            if column.server_default is not None:
+                ddl += f" NOT NULL DEFAULT {column.server_default.arg}" if not column.nullable else f" DEFAULT {column.server_default.arg}"
+            connection.exec_driver_sql(ddl)
+
+
+class _IteratedResult:
+    """Async iteration over a sync Result, mirroring AsyncResult"""
+
+    def __init__(self, result):
+        self._result = result
+
+    async def __aiter__(self):
+        for row in self._result:
+            yield row
+
+
+class SyncSessionAdapter:
+    """
+    Wraps a blocking Session behind the AsyncSession call signatures so the
+    route handlers can run unchanged on either engine when ASYNC_DB is off
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        return self.sync_session.execute(statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return self.sync_session.scalar(statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return self.sync_session.scalars(statement, *args, **kwargs)
+
+    async def stream(self, statement, *args, **kwargs):
+        result = self.sync_session.execute(statement, *args, **kwargs)
+        return _IteratedResult(result)
+
+    async def get(self, entity, ident, **kwargs):
+        return self.sync_session.get(entity, ident, **kwargs)
+
+    async def delete(self, instance) -> None:
+        self.sync_session.delete(instance)
+
+    async def flush(self) -> None:
+        self.sync_session.flush()
+
+    async def refresh(self, instance, *args, **kwargs) -> None:
+        self.sync_session.refresh(instance, *args, **kwargs)
+
+    async def commit(self) -> None:
+        self.sync_session.commit()
+
+    async def rollback(self) -> None:
+        self.sync_session.rollback()
+
+    async def close(self) -> None:
+        self.sync_session.close()
+
+
+# Blocking session for scripts and one-off jobs
+def get_sync_db() -> Generator[Session, None, None]:
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# Session for work that outlives a request dependency, such as a streamed response body
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    if not settings.ASYNC_DB:
+        # Same as AsyncSessionLocal: cached principals and committed rows stay readable
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            yield SyncSessionAdapter(db)
+        finally:
+            db.close()
+        return
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Dependency for getting the database session
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with session_scope() as db:
+        yield db
@@ -1,5 +1,5 @@
 from fastapi import Form, HTTPException
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 from datetime import date
 from typing import Optional
 import re
@@ -59,11 +59,11 @@ class SignUpForm(BaseModel):
         email: EmailStr = Form(...),
         password: str = Form(...),
         confirm_password: str = Form(...),
-        body_weight: Optional[float] = Form(None),
-        height: Optional[float] = Form(None),
-        bmr: Optional[float] = Form(None),
-        hydration_level: Optional[float] = Form(None),
-        muscle_mass: Optional[float] = Form(None),
+        body_weight: Optional[float] = Form(None, allow_inf_nan=False),
+        height: Optional[float] = Form(None, allow_inf_nan=False),
+        bmr: Optional[float] = Form(None, allow_inf_nan=False),
+        hydration_level: Optional[float] = Form(None, allow_inf_nan=False),
+        muscle_mass: Optional[float] = Form(None, allow_inf_nan=False),
         injury_history: Optional[str] = Form(None),
         medical_condition: Optional[str] = Form(None),
         allergies: Optional[str] = Form(None),
@@ -109,3 +109,13 @@ class SignUpForm(BaseModel):
             raise HTTPException(status_code=400, detail="Passwords do not match")
 
         return form
+
+# Pydantic model for the athlete stats update request body
+class AthleteUpdate(BaseModel):
+    # Readings go into the metric history, where NaN cannot be stored
+    model_config = ConfigDict(allow_inf_nan=False)
+
+    body_weight: Optional[float] = None
+    bmr: Optional[float] = None
+    hydration_level: Optional[float] = None
+    muscle_mass: Optional[float] = None
@@ -0,0 +1,125 @@
+"""
+Append-only metric history for athletes and the downsampled queries behind the history API
+"""
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, bindparam, cast, exists, func, insert, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import METRIC_CODES, METRIC_NAMES, Athlete, Measurement
+
+
+# Queue one history row per metric value that was set; committed with the caller's transaction
+async def record_measurements(db: AsyncSession, athlete_id: int, values: Dict[str, Optional[float]], recorded_at: Optional[datetime] = None):
+    timestamp = int((recorded_at or datetime.now(timezone.utc)).timestamp())
+    rows = [
+        {"athlete_id": athlete_id, "metric": METRIC_CODES[name], "recorded_at": timestamp, "value": value}
+        for name, value in values.items()
+        if value is not None and name in METRIC_CODES
+    ]
+    if rows:
+        await db.execute(insert(Measurement), rows)
+
+
+# Queue the history rows for many athletes' set values at once, as one executemany
+async def record_measurement_batch(db: AsyncSession, values_by_athlete: Dict[int, Dict[str, Optional[float]]], recorded_at: Optional[datetime] = None):
+    timestamp = int((recorded_at or datetime.now(timezone.utc)).timestamp())
+    rows = [
+        {"athlete_id": athlete_id, "metric": METRIC_CODES[name], "recorded_at": timestamp, "value": value}
+        for athlete_id, values in values_by_athlete.items()
+        for name, value in values.items()
+        if value is not None and name in METRIC_CODES
+    ]
+    if rows:
+        await db.execute(insert(Measurement), rows)
+
+
+# Apply many (athlete_id, metric, value, unix time) readings: one executemany for the history
+# rows and one per metric to move each athlete's current value to its newest reading
+async def apply_measurement_batch(db: AsyncSession, readings: List[Tuple[int, str, float, int]]):
+    if not readings:
+        return
+
+    await db.execute(insert(Measurement), [
+        {"athlete_id": athlete_id, "metric": METRIC_CODES[metric], "recorded_at": timestamp, "value": value}
+        for athlete_id, metric, value, timestamp in readings
+    ])
+
+    latest: Dict[Tuple[int, str], Tuple[float, int]] = {}
+    for athlete_id, metric, value, timestamp in readings:
+        current = latest.get((athlete_id, metric))
+        if current is None or timestamp >= current[1]:
+            latest[(athlete_id, metric)] = (value, timestamp)
+
+    athletes = Athlete.__table__
+    for metric in {metric for _, metric in latest}:
+        # Older readings than what the history already holds only go into the history.
+        # Every current value has a reading behind it (see record_current_values)
+        newer_reading = exists().where(
+            Measurement.athlete_id == bindparam("a_id"),
+            Measurement.metric == METRIC_CODES[metric],
+            Measurement.recorded_at > bindparam("ts"),
+        )
+        statement = (
+            update(athletes)
+            .where(athletes.c.id == bindparam("a_id"), ~newer_reading)
+            .values({metric: bindparam("new_value")})
+        )
+        await db.execute(statement, [
+            {"a_id": athlete_id, "ts": timestamp, "new_value": value}
+            for (athlete_id, name), (value, timestamp) in latest.items()
+            if name == metric
+        ])
+
+
+# Migration step: give current values set before the history existed a reading, dated
+# at the athlete's last write, so older uploaded readings do not replace them
+def record_current_values(connection: Connection) -> None:
+    athletes = Athlete.__table__
+    set_at = cast(func.strftime("%s", func.coalesce(athletes.c.updated_at, athletes.c.registration_date, "now")), Integer)
+    for name, code in METRIC_CODES.items():
+        has_reading = exists().where(Measurement.athlete_id == athletes.c.id, Measurement.metric == code)
+        connection.execute(insert(Measurement).from_select(
+            ["athlete_id", "metric", "recorded_at", "value"],
+            select(athletes.c.id, literal(code), set_at, athletes.c[name]).where(athletes.c[name].is_not(None), ~has_reading),
+        ))
+
+
+# Bucketed min/mean/max per metric over [start, end], at most `points` buckets per metric
+async def downsampled_history(db: AsyncSession, athlete_id: int, metrics: Iterable[str], start: datetime, end: datetime, points: int) -> Dict[str, List[dict]]:
+    start_ts = int(start.timestamp())
+    end_ts = int(end.timestamp())
+    width = max(1, -(-(end_ts - start_ts + 1) // points))
+    codes = [METRIC_CODES[name] for name in metrics]
+
+    bucket = ((Measurement.recorded_at - start_ts) // width).label("bucket")
+    query = (
+        select(
+            Measurement.metric,
+            bucket,
+            func.min(Measurement.value),
+            func.avg(Measurement.value),
+            func.max(Measurement.value),
+            func.count(),
+        )
+        .where(
+            Measurement.athlete_id == athlete_id,
+            Measurement.metric.in_(codes),
+            Measurement.recorded_at.between(start_ts, end_ts),
+        )
+        .group_by(Measurement.metric, bucket)
+        .order_by(Measurement.metric, bucket)
+    )
+
+    history = {METRIC_NAMES[code]: [] for code in codes}
+    for metric, bucket_index, low, mean, high, count in await db.execute(query):
+        history[METRIC_NAMES[metric]].append({
+            "time": datetime.fromtimestamp(start_ts + bucket_index * width, timezone.utc).isoformat(),
+            "min": low,
+            "mean": mean,
+            "max": high,
+            "count": count,
+        })
+    return history
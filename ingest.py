@@ -0,0 +1,97 @@
+"""
+Streaming parser and batch validation for bulk measurement uploads (CSV or NDJSON)
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from itertools import islice
+from typing import IO, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError, model_validator
+
+from forms import AthleteUpdate
+
+# Columns (CSV header) or keys (NDJSON) of an uploaded row
+INGEST_COLUMNS = ("athlete_id", "metric", "value", "time")
+# Undecodable bytes are read as this character, so the rows holding them can be reported
+REPLACEMENT_CHARACTER = "\ufffd"
+INVALID_UTF8 = "Not valid UTF-8 text"
+
+
+class IngestRow(BaseModel):
+    athlete_id: int
+    metric: str
+    value: float = Field(allow_inf_nan=False)
+    time: Optional[datetime] = None
+
+    # The reading must be a valid AthleteUpdate for that metric
+    @model_validator(mode="after")
+    def check_metric(self) -> "IngestRow":
+        if self.metric not in AthleteUpdate.model_fields:
+            raise ValueError(f"Unknown metric '{self.metric}'")
+        AthleteUpdate(**{self.metric: self.value})
+        return self
+
+    def timestamp(self, default: int) -> int:
+        if self.time is None:
+            return default
+        moment = self.time if self.time.tzinfo else self.time.replace(tzinfo=timezone.utc)
+        return int(moment.timestamp())
+
+
+# Yield (row number, record or error message) from an uploaded file without reading it whole
+def iter_records(file: IO[bytes], filename: Optional[str], content_type: Optional[str]) -> Iterator[Tuple[int, object]]:
+    # utf-8-sig drops the byte order mark spreadsheet exports start with
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", errors="replace", newline="")
+    name = (filename or "").lower()
+
+    if name.endswith((".ndjson", ".jsonl")) or (content_type or "").endswith("ndjson"):
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            if REPLACEMENT_CHARACTER in line:
+                yield line_number, INVALID_UTF8
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, f"Invalid JSON: {e}"
+        return
+
+    # CSV: line 1 is the header
+    reader = csv.DictReader(text)
+    missing = [column for column in INGEST_COLUMNS[:3] if column not in (reader.fieldnames or [])]
+    if missing:
+        yield 1, f"Missing CSV columns: {', '.join(missing)}"
+        return
+    for record in reader:
+        if any(REPLACEMENT_CHARACTER in value for value in record.values() if isinstance(value, str)):
+            yield reader.line_num, INVALID_UTF8
+            continue
+        yield reader.line_num, {key: value or None for key, value in record.items()}
+
+
+# Pull up to `size` records from the stream; an empty list means the upload is exhausted
+def next_batch(records: Iterator[Tuple[int, object]], size: int) -> List[Tuple[int, object]]:
+    return list(islice(records, size))
+
+
+# Split a batch into validated rows and per-row errors
+def validate_batch(batch: List[Tuple[int, object]]) -> Tuple[List[Tuple[int, IngestRow]], List[dict]]:
+    rows, errors = [], []
+    for line_number, record in batch:
+        if isinstance(record, str):
+            errors.append({"row": line_number, "error": record})
+            continue
+        if not isinstance(record, dict):
+            errors.append({"row": line_number, "error": "Expected an object"})
+            continue
+        try:
+            rows.append((line_number, IngestRow.model_validate(record)))
+        except ValidationError as e:
+            message = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in e.errors()
+            )
+            errors.append({"row": line_number, "error": message})
+    return rows, errors
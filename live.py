@@ -0,0 +1,150 @@
+"""
+In-process pub/sub for live athlete updates, pushed to dashboards over WebSockets
+
+Publishing never blocks: each subscriber holds one mailbox of pending field
+changes, and changes arriving faster than a client reads them are merged into
+it, so a slow client gets the latest values in fewer messages instead of an
+ever-growing queue. A client that cannot take a message within
+LIVE_SEND_TIMEOUT_SECONDS is disconnected.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+
+from config import settings
+from metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One subscriber's mailbox of changes not yet sent"""
+
+    __slots__ = ("athlete_id", "_pending", "_version", "_ready")
+
+    def __init__(self, athlete_id: int):
+        self.athlete_id = athlete_id
+        self._pending: Dict[str, object] = {}
+        self._version: Optional[int] = None
+        self._ready = asyncio.Event()
+
+    # Merge a delta into the mailbox; later values for a field replace earlier ones
+    def offer(self, version: Optional[int], changes: Dict[str, object]) -> bool:
+        coalesced = self._ready.is_set()
+        self._pending.update(changes)
+        self._version = version
+        self._ready.set()
+        return coalesced
+
+    # Wait for the next message: everything that changed since the last one
+    async def next_message(self) -> dict:
+        await self._ready.wait()
+        message = {"athlete_id": self.athlete_id, "version": self._version, "changes": self._pending}
+        self._pending = {}
+        self._ready.clear()
+        return message
+
+
+class LiveHub:
+    """Subscribers grouped by athlete id, with counters for /metrics"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+        self.published = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def subscribe(self, athlete_id: int) -> Subscription:
+        subscription = Subscription(athlete_id)
+        self._subscribers[athlete_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.athlete_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.athlete_id]
+
+    # Hand a delta to every subscriber of the athlete; returns how many were reached
+    def publish(self, athlete_id: int, version: Optional[int], changes: Dict[str, object]) -> int:
+        if not changes:
+            return 0
+        self.published += 1
+        subscribers = self._subscribers.get(athlete_id, ())
+        for subscription in subscribers:
+            self.coalesced += subscription.offer(version, changes)
+        return len(subscribers)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def metrics(self) -> List[str]:
+        return [
+            "# HELP statsync_live_subscribers Open live update connections",
+            "# TYPE statsync_live_subscribers gauge",
+            f"statsync_live_subscribers {self.subscriber_count()}",
+            "# HELP statsync_live_published_total Athlete deltas published",
+            "# TYPE statsync_live_published_total counter",
+            f"statsync_live_published_total {self.published}",
+            "# HELP statsync_live_delivered_total Messages sent to live clients",
+            "# TYPE statsync_live_delivered_total counter",
+            f"statsync_live_delivered_total {self.delivered}",
+            "# HELP statsync_live_coalesced_total Deltas merged into a message a client had not read yet",
+            "# TYPE statsync_live_coalesced_total counter",
+            f"statsync_live_coalesced_total {self.coalesced}",
+            "# HELP statsync_live_dropped_total Clients disconnected for not keeping up",
+            "# TYPE statsync_live_dropped_total counter",
+            f"statsync_live_dropped_total {self.dropped}",
+        ]
+
+
+live_hub = LiveHub()
+register_collector(live_hub.metrics)
+
+
+# Pending changes -> client, until it disconnects or stops reading
+async def _send_updates(websocket: WebSocket, subscription: Subscription) -> None:
+    while True:
+        message = await subscription.next_message()
+        try:
+            await asyncio.wait_for(websocket.send_json(message), timeout=settings.LIVE_SEND_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            live_hub.dropped += 1
+            logger.info("Dropping live client for athlete %s: send timed out", subscription.athlete_id)
+            return
+        live_hub.delivered += 1
+
+
+# Clients only listen; reading is how a disconnect is noticed
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+# Serve one accepted WebSocket until either side is done
+async def stream_athlete_updates(websocket: WebSocket, athlete_id: int) -> None:
+    subscription = live_hub.subscribe(athlete_id)
+    tasks = [
+        asyncio.create_task(_send_updates(websocket, subscription)),
+        asyncio.create_task(_wait_for_disconnect(websocket)),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        live_hub.unsubscribe(subscription)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Still open means the client fell behind: ask it to reconnect later
+    if websocket.application_state == WebSocketState.CONNECTED and websocket.client_state == WebSocketState.CONNECTED:
+        try:
+            await asyncio.wait_for(websocket.close(code=1013), timeout=settings.LIVE_SEND_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, RuntimeError):
+            pass
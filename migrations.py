@@ -0,0 +1,117 @@
+"""
+Versioned schema migrations, tracked in SQLite's user_version
+
+Run `python migrations.py` once per deploy, before the workers start; at startup
+a worker then only reads the version. Every step is idempotent, so a database
+created before versioning (user_version 0) is brought up to date by running
+them all.
+"""
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.engine import Connection, Engine
+
+import models  # Also registers the tables on Base.metadata
+from db import Base, add_missing_columns, engine
+from history import record_current_values
+from search import ensure_search_index
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaOutOfDate(RuntimeError):
+    """The database is behind the code and migrations are not applied at startup"""
+
+
+def _create_tables(connection: Connection) -> None:
+    Base.metadata.create_all(bind=connection)
+
+
+# New columns on existing tables, such as the athlete row version
+def _add_columns(connection: Connection) -> None:
+    add_missing_columns(connection, Base.metadata)
+
+
+# create_all skips indexes added to tables that already exist
+def _create_indexes(connection: Connection) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+
+# Full-text search index over athletes, kept in sync by triggers
+def _create_search_index(connection: Connection) -> None:
+    ensure_search_index(connection)
+
+
+# Current metric values that predate the history, recorded as its first readings
+def _record_current_values(connection: Connection) -> None:
+    record_current_values(connection)
+
+
+# Rosters predate trainer ownership: with a single trainer every athlete is theirs.
+# With several there is no telling whose is whose, so athletes stay unassigned
+# until claimed from the trainer dashboard (or through PUT /trainer/roster)
+def _assign_sole_trainer(connection: Connection) -> None:
+    trainer_ids = connection.execute(select(models.Trainer.id).limit(2)).scalars().all()
+    if len(trainer_ids) == 1:
+        connection.execute(
+            update(models.Athlete.__table__).where(models.Athlete.trainer_id.is_(None)).values(trainer_id=trainer_ids[0])
+        )
+
+
+# Applied in order; the database's user_version is the number already applied.
+# Append new steps, never reorder or edit released ones
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("create tables", _create_tables),
+    ("add athlete version and updated_at columns", _add_columns),
+    ("create roster and lookup indexes", _create_indexes),
+    ("create athlete full-text search index", _create_search_index),
+    ("record current metric values in the history", _record_current_values),
+    ("assign athletes to the only trainer", _assign_sole_trainer),
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(connection: Connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+# Apply pending migrations; returns how many ran
+def migrate(bind: Engine = engine) -> int:
+    with bind.connect() as connection:
+        if schema_version(connection) >= SCHEMA_VERSION:
+            return 0
+
+    # Transactions are issued by hand: BEGIN IMMEDIATE takes the write lock up front,
+    # so of several processes starting at once only the first applies the steps
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            current = schema_version(connection)
+            for number, (description, step) in enumerate(MIGRATIONS[current:], start=current + 1):
+                logger.info("Applying migration %d: %s", number, description)
+                step(connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {max(current, SCHEMA_VERSION)}")
+            connection.exec_driver_sql("COMMIT")
+        except BaseException:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+    return max(0, SCHEMA_VERSION - current)
+
+
+# For workers that must not change the schema themselves
+def check_schema(bind: Engine = engine) -> None:
+    with bind.connect() as connection:
+        version = schema_version(connection)
+    if version < SCHEMA_VERSION:
+        raise SchemaOutOfDate(
+            f"Database schema is at version {version}, the code needs {SCHEMA_VERSION}: run `python migrations.py`"
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    applied = migrate()
+    logger.info("Schema at version %d (%d migrations applied)", SCHEMA_VERSION, applied)
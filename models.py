@@ -1,8 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, Date
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, Date, DateTime, Index, literal_column
 from sqlalchemy.orm import relationship
 from sqlalchemy import ForeignKey
 from db import Base
 
+
+# Naive UTC timestamp, as stored by SQLite
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Athlete(Base):
     __tablename__ = 'athletes'
 
@@ -42,13 +49,30 @@ class Athlete(Base):
     registration_date = Column(Date, nullable=True)
     photo = Column(String, nullable=True)
 
+    # Bumped by every UPDATE, ORM or Core; drive the ETag and Last-Modified of athlete resources
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version + 1"))
+    updated_at = Column(DateTime, nullable=True, default=utcnow, onupdate=utcnow)
+
 
     # Add a foreign key to link to the Trainer model
-    trainer_id = Column(Integer, ForeignKey('trainers.id'))
+    # (indexed: SQLite appends the rowid, so this also serves roster pages keyed on id)
+    trainer_id = Column(Integer, ForeignKey('trainers.id'), index=True)
 
     # Create a relationship with Trainer
     trainer = relationship('Trainer', back_populates='athletes')
 
+    __table_args__ = (
+        # Trainer dashboard roster, sorted by name
+        Index('ix_athletes_trainer_roster', 'trainer_id', 'last_name', 'first_name'),
+        # Roster filters: age range, sport then position, registration window, each sorted by
+        # that column. Gender and the metrics are filtered and sorted over the trainer_id index
+        Index('ix_athletes_trainer_age', 'trainer_id', 'age'),
+        Index('ix_athletes_trainer_sport_position', 'trainer_id', 'sports_playing', 'position'),
+        Index('ix_athletes_trainer_registration', 'trainer_id', 'registration_date'),
+    )
+    # Read the bumped version back with RETURNING, since lazy refreshes are not possible on an AsyncSession
+    __mapper_args__ = {"eager_defaults": True}
+
 class Trainer(Base):
     __tablename__ = 'trainers'
 
@@ -67,4 +91,30 @@ class Trainer(Base):
     photo = Column(String, nullable=True)
 
     # Create the relationship with Athlete
-    athletes = relationship('Athlete', back_populates='trainer')
\ No newline at end of file
+    athletes = relationship('Athlete', back_populates='trainer')
+
+
+# Codes for the metrics kept in the measurement history
+METRIC_CODES = {
+    "body_weight": 1,
+    "bmr": 2,
+    "hydration_level": 3,
+    "muscle_mass": 4,
+}
+METRIC_NAMES = {code: name for name, code in METRIC_CODES.items()}
+
+
+class Measurement(Base):
+    __tablename__ = 'measurements'
+
+    # Append-only history of athlete metrics, one narrow row per reading
+    id = Column(Integer, primary_key=True)
+    athlete_id = Column(Integer, ForeignKey('athletes.id', ondelete='CASCADE'), nullable=False)
+    metric = Column(SmallInteger, nullable=False)
+    recorded_at = Column(Integer, nullable=False)  # Unix time, seconds (UTC)
+    value = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Time-range scans per athlete and metric
+        Index('ix_measurements_series', 'athlete_id', 'metric', 'recorded_at'),
+    )
@@ -0,0 +1,208 @@
+"""
+Renders athlete stats PDFs on a worker process pool, with a content-addressed cache
+"""
+import asyncio
+import hashlib
+import re
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+
+from cache import ByteLRUCache
+from conditional import source_revision
+from config import settings
+from metrics import PDF_RENDER_TIME, register_collector
+
+# Rendered PDFs keyed by a hash of the exact lines they contain
+pdf_cache = ByteLRUCache(max_bytes=settings.PDF_CACHE_MAX_BYTES)
+
+# Changes with the layout code, so client copies of an old layout are not revalidated as current;
+# read on first use rather than at import
+def pdf_revision() -> str:
+    return source_revision(__file__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _pdf_cache_metrics() -> List[str]:
+    stats = pdf_cache.stats()
+    return [
+        "# HELP statsync_pdf_cache_hits_total Stats PDFs served from the cache",
+        "# TYPE statsync_pdf_cache_hits_total counter",
+        f"statsync_pdf_cache_hits_total {stats['hits']}",
+        "# HELP statsync_pdf_cache_misses_total Stats PDFs that had to be rendered",
+        "# TYPE statsync_pdf_cache_misses_total counter",
+        f"statsync_pdf_cache_misses_total {stats['misses']}",
+        "# HELP statsync_pdf_cache_bytes Size of the cached PDFs",
+        "# TYPE statsync_pdf_cache_bytes gauge",
+        f"statsync_pdf_cache_bytes {stats['bytes']}",
+    ]
+
+
+register_collector(_pdf_cache_metrics)
+_in_flight: Dict[str, "asyncio.Future[bytes]"] = {}
+
+
+# Label/value lines printed for an athlete, as plain strings so they can cross process boundaries
+def athlete_stat_lines(athlete) -> List[Tuple[str, str]]:
+    attributes = [
+        ("First Name", athlete.first_name),
+        ("Last Name", athlete.last_name),
+        ("Date of Birth", athlete.date_of_birth),
+        ("Age", athlete.age),
+        ("Gender", athlete.gender),
+        ("Address", athlete.address or "Not Set"),
+        ("Contact Number", athlete.contact_number or "Not Set"),
+        ("Emergency Contact", athlete.emergency_contact or "Not Set"),
+        ("Emergency Contact Number", athlete.emergency_contact_number or "Not Set"),
+        ("Sports Playing", athlete.sports_playing or "Not Set"),
+        ("Position", athlete.position or "Not Set"),
+        ("Email", athlete.email),
+        ("Body Weight", athlete.body_weight or "Not Set"),
+        ("BMR", athlete.bmr or "Not Set"),
+        ("Hydration Level", athlete.hydration_level or "Not Set"),
+        ("Muscle Mass", athlete.muscle_mass or "Not Set"),
+        ("Injury History", athlete.injury_history or "None"),
+        ("Medical Condition", athlete.medical_condition or "None"),
+        ("Allergies", athlete.allergies or "None"),
+        ("Training Goal", athlete.training_goal or "Not Set"),
+    ]
+    return [(label, str(value)) for label, value in attributes]
+
+
+# Draw the stats summary PDF; runs inside a worker process
+def render_stats_pdf(lines: List[Tuple[str, str]]) -> bytes:
+    # Imported here, so only the workers that draw PDFs pay for loading reportlab
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    # Create a PDF buffer in memory
+    buffer = BytesIO()
+
+    # Create the PDF object, using the buffer as its "file."
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+
+    # Set title and general formatting
+    pdf.setTitle("Athlete Stats")
+    pdf.setFont("Helvetica-Bold", 16)
+    pdf.drawString(200, 750, "Athlete Stats Summary")
+
+    pdf.line(50, 740, 550, 740)
+    pdf.setFont("Helvetica", 12)
+    y = 710
+
+    # Loop through each attribute and print it in the PDF
+    for label, value in lines:
+        pdf.drawString(100, y, f"{label}: {value}")
+        y -= 20  # Move down for the next line
+        if y < 100:  # If the page is full, add a new page
+            pdf.showPage()
+            pdf.setFont("Helvetica", 12)
+            y = 750  # Reset y-coordinate
+
+    # Adding a footer
+    pdf.setFont("Helvetica-Oblique", 10)
+    pdf.drawString(250, 50, "Generated by StatSync")
+
+    # Finalize the PDF
+    pdf.showPage()
+    pdf.save()
+
+    # Get the PDF data from the buffer
+    pdf_data = buffer.getvalue()
+    buffer.close()
+    return pdf_data
+
+
+# Process pool for reportlab, started on first use
+def get_pdf_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.PDF_WORKERS)
+    return _executor
+
+
+def stats_cache_key(lines: List[Tuple[str, str]]) -> str:
+    digest = hashlib.sha256()
+    for label, value in lines:
+        digest.update(f"{label}\x1f{value}\x1e".encode())
+    return digest.hexdigest()
+
+
+# Return (pdf bytes, served from cache); concurrent misses for the same content share one render
+async def athlete_stats_pdf(athlete) -> Tuple[bytes, bool]:
+    lines = athlete_stat_lines(athlete)
+    key = stats_cache_key(lines)
+
+    pdf_data = pdf_cache.get(key)
+    if pdf_data is not None:
+        return pdf_data, True
+
+    pending = _in_flight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending), False
+
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    pending = _in_flight[key] = loop.run_in_executor(get_pdf_executor(), render_stats_pdf, lines)
+    try:
+        pdf_data = await asyncio.shield(pending)
+        PDF_RENDER_TIME.observe(time.perf_counter() - started)
+        pdf_cache.set(key, pdf_data)
+    finally:
+        _in_flight.pop(key, None)
+    return pdf_data, False
+
+
+class _ZipSink:
+    """Write-only stream that collects zipfile output until it is drained"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stats_pdf_filename(athlete) -> str:
+    name = re.sub(r"[^A-Za-z0-9]+", "_", f"{athlete.last_name or ''}_{athlete.first_name or ''}").strip("_")
+    return f"{name or 'athlete'}_{athlete.id}.pdf"
+
+
+# Stream a ZIP of stats PDFs while they are rendered; at most `window` PDFs are pending at once
+async def stream_stats_zip(athletes: AsyncIterable, window: int) -> AsyncIterator[bytes]:
+    sink = _ZipSink()
+    # Not seekable, so zipfile writes each entry with a trailing data descriptor
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    pending = deque()
+
+    async def write_oldest():
+        filename, task = pending.popleft()
+        pdf_data, _ = await task
+        archive.writestr(filename, pdf_data)
+        return sink.drain()
+
+    try:
+        async for athlete in athletes:
+            pending.append((stats_pdf_filename(athlete), asyncio.ensure_future(athlete_stats_pdf(athlete))))
+            if len(pending) >= window:
+                yield await write_oldest()
+        while pending:
+            yield await write_oldest()
+        archive.close()
+        yield sink.drain()
+    finally:
+        for _, task in pending:
+            task.cancel()
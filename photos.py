@@ -0,0 +1,305 @@
+"""
+Profile photos: streamed multipart upload, content-addressed storage and WebP thumbnails
+
+Each photo lives under PHOTO_DIR/<first two hex digits>/<sha256>/, holding the
+original bytes and one square thumbnail per configured size. Uploading bytes that
+are already stored only points the profile at the existing directory.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from conditional import is_not_modified
+from config import settings
+
+# Accepted original formats and the extension they are stored under
+PHOTO_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+PHOTO_MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "gif": "image/gif"}
+# Content-addressed, so a URL never changes meaning; private since photos are personal data
+PHOTO_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# Room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+_digest_pattern = re.compile(r"^[0-9a-f]{64}$")
+_range_pattern = re.compile(r"^bytes=(\d*)-(\d*)$")
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class PhotoError(Exception):
+    """An upload that cannot be stored as a photo, with the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def is_photo_digest(value) -> bool:
+    return isinstance(value, str) and bool(_digest_pattern.match(value))
+
+
+def photo_directory(digest: str) -> str:
+    return os.path.join(settings.PHOTO_DIR, digest[:2], digest)
+
+
+# Thumbnail URL for a stored photo, or None for profiles without one (or with a legacy value)
+def photo_url(digest, size: int) -> Optional[str]:
+    if not is_photo_digest(digest):
+        return None
+    return f"/photos/{digest}/{size}"
+
+
+class _PhotoReceiver:
+    """Multipart callbacks that hash one file field and hand its bytes over for writing"""
+
+    def __init__(self, field_name: str, max_bytes: int):
+        self.field_name = field_name.encode()
+        self.max_bytes = max_bytes
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.found = False
+        self._in_field = False
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._pending: List[bytes] = []
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._in_field = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._in_field = not self.found and options.get(b"name") == self.field_name and b"filename" in options
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._in_field:
+            return
+        chunk = data[start:end]
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise PhotoError(413, f"Photos are limited to {self.max_bytes} bytes")
+        self.digest.update(chunk)
+        self._pending.append(chunk)
+
+    def on_part_end(self) -> None:
+        if self._in_field:
+            self.found = True
+            self._in_field = False
+
+    def take_pending(self) -> bytes:
+        pending = b"".join(self._pending)
+        self._pending.clear()
+        return pending
+
+
+# Stream the request body's photo field to a temporary file; returns (path, sha256 hex digest)
+async def receive_photo(request: Request, field_name: str = "photo") -> Tuple[str, str]:
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise PhotoError(400, "Expected a multipart/form-data upload")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > settings.PHOTO_MAX_BYTES + MULTIPART_OVERHEAD:
+        raise PhotoError(413, f"Photos are limited to {settings.PHOTO_MAX_BYTES} bytes")
+
+    upload_dir = os.path.join(settings.PHOTO_DIR, "tmp")
+    os.makedirs(upload_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=upload_dir)
+    receiver = _PhotoReceiver(field_name, settings.PHOTO_MAX_BYTES)
+    parser = MultipartParser(options[b"boundary"], receiver.callbacks())
+    try:
+        with os.fdopen(fd, "wb") as target:
+            # Each network chunk is hashed as parsed and written off the event loop
+            async for chunk in request.stream():
+                parser.write(chunk)
+                pending = receiver.take_pending()
+                if pending:
+                    await run_in_threadpool(target.write, pending)
+            parser.finalize()
+        if not receiver.found:
+            raise PhotoError(400, f"No {field_name} file in the upload")
+    except MultipartParseError:
+        os.remove(temp_path)
+        raise PhotoError(400, "Malformed multipart upload")
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path, receiver.digest.hexdigest()
+
+
+def _write_atomically(image, target: str, **options) -> None:
+    partial = f"{target}.{os.getpid()}.tmp"
+    image.save(partial, **options)
+    os.replace(partial, target)
+
+
+def _stored_original(directory: str) -> Optional[str]:
+    for extension in PHOTO_FORMATS.values():
+        path = os.path.join(directory, f"original.{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _is_stored(directory: str, sizes: List[int]) -> bool:
+    return _stored_original(directory) is not None and all(
+        os.path.exists(os.path.join(directory, f"{size}.webp")) for size in sizes
+    )
+
+
+# Runs on the photo worker pool: validate the image, write missing thumbnails, then keep the original
+def process_photo(temp_path: str, directory: str, sizes: List[int], quality: int) -> None:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(temp_path) as image:
+            if image.format not in PHOTO_FORMATS:
+                raise PhotoError(415, f"Unsupported image format: {image.format}")
+            extension = PHOTO_FORMATS[image.format]
+            image.load()
+            image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise PhotoError(415, "The upload is not a readable image")
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    os.makedirs(directory, exist_ok=True)
+    for size in sizes:
+        target = os.path.join(directory, f"{size}.webp")
+        if not os.path.exists(target):
+            thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            _write_atomically(thumbnail, target, format="WEBP", quality=quality, method=4)
+
+    # The original goes in last, so its presence means the directory is complete
+    if _stored_original(directory) is None:
+        os.replace(temp_path, os.path.join(directory, f"original.{extension}"))
+
+
+# Process pool for Pillow, started on first use
+def get_photo_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.PHOTO_WORKERS)
+    return _executor
+
+
+# Receive, deduplicate and thumbnail an uploaded photo; returns its content digest
+async def store_photo(request: Request, field_name: str = "photo") -> str:
+    temp_path, digest = await receive_photo(request, field_name)
+    directory = photo_directory(digest)
+    sizes = sorted(settings.PHOTO_THUMBNAIL_SIZES)
+    try:
+        if not await run_in_threadpool(_is_stored, directory, sizes):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                get_photo_executor(), process_photo, temp_path, directory, sizes, settings.PHOTO_WEBP_QUALITY
+            )
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return digest
+
+
+# (path, media type) of a stored thumbnail or original, or None
+def find_photo_file(digest: str, variant: str) -> Optional[Tuple[str, str]]:
+    if not is_photo_digest(digest):
+        return None
+    directory = photo_directory(digest)
+    if variant == "original":
+        path = _stored_original(directory)
+        if path is None:
+            return None
+        return path, PHOTO_MEDIA_TYPES[path.rsplit(".", 1)[1]]
+    if not variant.isdigit() or int(variant) not in settings.PHOTO_THUMBNAIL_SIZES:
+        return None
+    path = os.path.join(directory, f"{variant}.webp")
+    return (path, "image/webp") if os.path.exists(path) else None
+
+
+# Single byte range from a Range header: (start, end inclusive), "unsatisfiable", or None for the whole file
+def parse_range(header: Optional[str], size: int):
+    match = _range_pattern.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return "unsatisfiable"
+    if end < start:
+        return None
+    return start, end
+
+
+def _iter_file_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as source:
+        source.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = source.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+# Serve a stored file with immutable caching, ETag revalidation and single-range requests
+def photo_response(request: Request, path: str, media_type: str, etag: str) -> Response:
+    stat_result = os.stat(path)
+    headers = {"ETag": etag, "Cache-Control": PHOTO_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if is_not_modified(request, etag, None):
+        return Response(status_code=304, headers=headers)
+
+    # A Range guarded by a stale If-Range gets the whole file
+    if_range = request.headers.get("if-range")
+    byte_range = parse_range(request.headers.get("range"), stat_result.st_size) if if_range in (None, etag) else None
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
+    if byte_range == "unsatisfiable":
+        headers["Content-Range"] = f"bytes */{stat_result.st_size}"
+        return Response(status_code=416, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_iter_file_range(path, start, end), status_code=206, media_type=media_type, headers=headers)
@@ -0,0 +1,168 @@
+"""
+Typed filter and sort grammar for roster listings over whitelisted athlete columns
+
+Filters are written field:operator[:value], e.g. age:gte:18, gender:eq:F,
+sports_playing:in:Rugby|Football, registration_date:gte:2024-01-01 or bmr:null.
+Sorting takes a field name, prefixed with "-" for descending order.
+"""
+import base64
+import binascii
+import json
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import and_, or_, select
+
+from models import Athlete
+
+
+class RosterQueryError(ValueError):
+    """A filter, sort or cursor the roster grammar does not accept"""
+
+
+# Filterable columns and the type their values are parsed as
+FILTER_FIELDS = {
+    "age": (Athlete.age, int),
+    "gender": (Athlete.gender, str),
+    "date_of_birth": (Athlete.date_of_birth, date),
+    "registration_date": (Athlete.registration_date, date),
+    "sports_playing": (Athlete.sports_playing, str),
+    "position": (Athlete.position, str),
+    "body_weight": (Athlete.body_weight, float),
+    "height": (Athlete.Height, float),
+    "bmr": (Athlete.bmr, float),
+    "hydration_level": (Athlete.hydration_level, float),
+    "muscle_mass": (Athlete.muscle_mass, float),
+}
+# Sortable columns: every filterable one plus the names and the primary key
+SORT_FIELDS = {
+    "id": (Athlete.id, int),
+    "first_name": (Athlete.first_name, str),
+    "last_name": (Athlete.last_name, str),
+    **FILTER_FIELDS,
+}
+FILTER_OPERATORS = {
+    "eq": lambda column, value: column == value,
+    "ne": lambda column, value: column != value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "in": lambda column, values: column.in_(values),
+    "null": lambda column, _: column.is_(None),
+    "notnull": lambda column, _: column.is_not(None),
+}
+NULLARY_OPERATORS = {"null", "notnull"}
+MAX_FILTERS = 10
+
+_adapters = {value_type: TypeAdapter(value_type) for value_type in (int, str, float, date)}
+
+
+def _parse_value(field: str, value_type, raw):
+    try:
+        return _adapters[value_type].validate_python(raw)
+    except ValidationError:
+        raise RosterQueryError(f"Invalid value for {field}: {raw!r}")
+
+
+# Turn one field:operator[:value] expression into a WHERE clause
+def parse_filter(expression: str):
+    field, _, rest = expression.partition(":")
+    operator, _, raw = rest.partition(":")
+    if field not in FILTER_FIELDS:
+        raise RosterQueryError(f"Unknown filter field: {field}")
+    if operator not in FILTER_OPERATORS:
+        raise RosterQueryError(f"Unknown filter operator: {operator or '(none)'}")
+    column, value_type = FILTER_FIELDS[field]
+
+    if operator in NULLARY_OPERATORS:
+        if raw:
+            raise RosterQueryError(f"{operator} takes no value: {expression}")
+        return FILTER_OPERATORS[operator](column, None)
+    if not raw:
+        raise RosterQueryError(f"Missing value: {expression}")
+    if operator == "in":
+        value = [_parse_value(field, value_type, item) for item in raw.split("|")]
+    else:
+        value = _parse_value(field, value_type, raw)
+    return FILTER_OPERATORS[operator](column, value)
+
+
+# Split "-field" into (field, descending)
+def parse_sort(sort: Optional[str]) -> Tuple[str, bool]:
+    if not sort:
+        return "id", False
+    descending = sort.startswith("-")
+    field = sort[1:] if descending else sort
+    if field not in SORT_FIELDS:
+        raise RosterQueryError(f"Unknown sort field: {field}")
+    return field, descending
+
+
+# Opaque cursor for non-id sorts: the last row's sort value and id
+def encode_cursor(value, athlete_id: int) -> str:
+    if isinstance(value, date):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, athlete_id]).encode()).decode()
+
+
+def decode_cursor(token: str, sort_field: str):
+    try:
+        value, athlete_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise RosterQueryError("Invalid cursor")
+    if not isinstance(athlete_id, int):
+        raise RosterQueryError("Invalid cursor")
+    if value is not None:
+        value = _parse_value(sort_field, SORT_FIELDS[sort_field][1], value)
+    return value, athlete_id
+
+
+# Rows strictly after (value, id) in sort order; SQLite puts NULLs first ascending, last descending
+def _after_clause(column, descending: bool, value, athlete_id: int):
+    if not descending:
+        if value is None:
+            return or_(and_(column.is_(None), Athlete.id > athlete_id), column.is_not(None))
+        return or_(column > value, and_(column == value, Athlete.id > athlete_id))
+    if value is None:
+        return and_(column.is_(None), Athlete.id < athlete_id)
+    return or_(column < value, and_(column == value, Athlete.id < athlete_id), column.is_(None))
+
+
+# Apply filters, sort order and keyset cursor to a roster query
+def apply_roster_query(query, filters: Iterable[str], sort: Optional[str], after: Optional[str]):
+    filters = list(filters or [])
+    if len(filters) > MAX_FILTERS:
+        raise RosterQueryError(f"At most {MAX_FILTERS} filters are allowed")
+    for expression in filters:
+        query = query.where(parse_filter(expression))
+
+    sort_field, descending = parse_sort(sort)
+    column = SORT_FIELDS[sort_field][0]
+    if sort_field == "id":
+        query = query.order_by(Athlete.id.desc() if descending else Athlete.id)
+        if after is not None:
+            athlete_id = _parse_value("after", int, after)
+            query = query.where(Athlete.id < athlete_id if descending else Athlete.id > athlete_id)
+        return query, sort_field
+
+    # Tie-break on id in the same direction so the order is total and keyset-friendly
+    query = query.order_by(*((column.desc(), Athlete.id.desc()) if descending else (column, Athlete.id)))
+    if after is not None:
+        query = query.where(_after_clause(column, descending, *decode_cursor(after, sort_field)))
+    return query, sort_field
+
+
+# Cursor pointing just past this row, given the projection it was selected with
+def next_cursor_for(row, field_names: List[str], sort_field: str):
+    athlete_id = row[field_names.index("id")]
+    if sort_field == "id":
+        return athlete_id
+    return encode_cursor(row[field_names.index(sort_field)], athlete_id)
+
+
+# Roster of a trainer (or the unassigned pool when trainer_id is None), with no columns selected yet
+def roster_select(trainer_id: Optional[int], filters: Iterable[str], sort: Optional[str], after: Optional[str]):
+    query = select().where(Athlete.trainer_id.is_(None) if trainer_id is None else Athlete.trainer_id == trainer_id)
+    return apply_roster_query(query, filters, sort, after)
@@ -0,0 +1,125 @@
+"""
+Response schemas for athlete payloads, serialized by pydantic-core straight from selected columns
+
+Handlers select only the columns a payload needs and hand the row tuples over
+as they come from the database; no ORM objects are built and no per-field
+Python conversion runs, since dates and numbers are encoded by the compiled
+serializer.
+"""
+from datetime import date
+from typing import Iterable, List, Literal, Optional, Sequence, Union
+
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+
+
+class AthleteFields(TypedDict, total=False):
+    """Any projection of the athlete columns a trainer may list, by their public name"""
+
+    id: int
+    first_name: Optional[str]
+    last_name: Optional[str]
+    email: Optional[str]
+    gender: Optional[str]
+    age: Optional[int]
+    date_of_birth: Optional[date]
+    body_weight: Optional[float]
+    height: Optional[float]
+    bmr: Optional[float]
+    hydration_level: Optional[float]
+    muscle_mass: Optional[float]
+    sports_playing: Optional[str]
+    position: Optional[str]
+    training_goal: Optional[str]
+    injury_history: Optional[str]
+    medical_condition: Optional[str]
+    allergies: Optional[str]
+    registration_date: Optional[date]
+    version: int
+
+
+class RosterPage(BaseModel):
+    """One page of the athlete list, with the cursor for the next"""
+
+    athletes: List[AthleteFields]
+    # The last id when sorted by id, an opaque token for other sorts
+    next_cursor: Union[int, str, None] = None
+
+
+class AthleteProfile(BaseModel):
+    """An athlete's own record"""
+
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    date_of_birth: Optional[date] = None
+    email: Optional[str] = None
+    body_weight: Optional[float] = None
+    bmr: Optional[float] = None
+    age: Optional[int] = None
+    hydration_level: Optional[float] = None
+    muscle_mass: Optional[float] = None
+    address: Optional[str] = None
+    gender: Optional[str] = None
+
+
+class AthleteStats(BaseModel):
+    """The athlete as returned after a stats update"""
+
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    body_weight: Optional[float] = None
+    bmr: Optional[float] = None
+    age: Optional[int] = None
+    hydration_level: Optional[float] = None
+    muscle_mass: Optional[float] = None
+    address: Optional[str] = None
+    gender: Optional[str] = None
+    date_of_birth: Optional[date] = None
+
+
+class AthleteStatsUpdated(BaseModel):
+    """Response to an athlete stats update"""
+
+    message: str
+    athlete: AthleteStats
+
+
+class AthleteEditResult(BaseModel):
+    """Outcome of one edit in a batch update, with the row version it left behind"""
+
+    id: int
+    status: Literal["updated", "unchanged", "conflict", "not_found", "duplicate", "skipped"]
+    version: Optional[int] = None
+
+
+class AthleteBatchResult(BaseModel):
+    """Response to a batch athlete update, one result per edit in request order"""
+
+    results: List[AthleteEditResult]
+    updated: int
+    conflicts: int
+
+
+_athlete_fields = TypeAdapter(AthleteFields)
+
+
+# JSON for one projected row, as written by the streamed athlete list
+def dump_athlete_row(row: Sequence, field_names: Sequence[str]) -> bytes:
+    return _athlete_fields.dump_json(dict(zip(field_names, row)))
+
+
+# JSON for a page of projected rows; the values are trusted as selected, so nothing is validated
+def dump_roster_page(rows: Iterable[Sequence], field_names: Sequence[str], next_cursor: Union[int, str, None]) -> str:
+    page = RosterPage.model_construct(athletes=[dict(zip(field_names, row)) for row in rows], next_cursor=next_cursor)
+    return page.model_dump_json()
+
+
+# Columns to select for a model, in field order, looked up on the mapped class
+def model_columns(model, mapped) -> list:
+    return [getattr(mapped, name) for name in model.model_fields]
+
+
+# JSON for a model from a row whose leading columns came from model_columns
+def dump_model_row(model, row: Sequence) -> str:
+    return model.model_construct(**dict(zip(model.model_fields, row))).model_dump_json()
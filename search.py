@@ -0,0 +1,81 @@
+"""
+Full-text athlete search backed by an SQLite FTS5 index kept in sync by triggers
+"""
+import re
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Indexed columns, with their bm25 weight (names count most)
+SEARCH_COLUMNS = [
+    ("first_name", 10.0),
+    ("last_name", 10.0),
+    ("email", 5.0),
+    ("sports_playing", 2.0),
+    ("position", 2.0),
+    ("training_goal", 1.0),
+    ("injury_history", 1.0),
+]
+_columns = ", ".join(name for name, _ in SEARCH_COLUMNS)
+_new_values = ", ".join(f"new.{name}" for name, _ in SEARCH_COLUMNS)
+_old_values = ", ".join(f"old.{name}" for name, _ in SEARCH_COLUMNS)
+
+# External-content index over athletes; prefix indexes make type-ahead queries cheap
+SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS athletes_fts USING fts5(
+        {_columns}, content='athletes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS athletes_fts_insert AFTER INSERT ON athletes BEGIN
+        INSERT INTO athletes_fts(rowid, {_columns}) VALUES (new.id, {_new_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS athletes_fts_delete AFTER DELETE ON athletes BEGIN
+        INSERT INTO athletes_fts(athletes_fts, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS athletes_fts_update AFTER UPDATE OF {_columns} ON athletes BEGIN
+        INSERT INTO athletes_fts(athletes_fts, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+        INSERT INTO athletes_fts(rowid, {_columns}) VALUES (new.id, {_new_values});
+    END""",
+]
+
+
+# Create the index and its triggers, filling the index from existing rows the first time
+def ensure_search_index(connection) -> None:
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'athletes_fts'"
+    ).first()
+    for statement in SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        connection.exec_driver_sql("INSERT INTO athletes_fts(athletes_fts) VALUES ('rebuild')")
+
+
+# Turn free text into an FTS5 query: every word must match, the last one as a prefix
+def build_match_query(query: str) -> Optional[str]:
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+async def search_athletes(db: AsyncSession, query: str, trainer_id: Optional[int], limit: int) -> List[dict]:
+    match = build_match_query(query)
+    if match is None:
+        return []
+
+    weights = ", ".join(str(weight) for _, weight in SEARCH_COLUMNS)
+    owner = "a.trainer_id IS NULL" if trainer_id is None else "a.trainer_id = :trainer_id"
+    statement = text(f"""
+        SELECT a.id, a.first_name, a.last_name, a.email, a.sports_playing, a.position,
+               bm25(athletes_fts, {weights}) AS rank
+        FROM athletes_fts
+        JOIN athletes AS a ON a.id = athletes_fts.rowid
+        WHERE athletes_fts MATCH :match AND {owner}
+        ORDER BY rank
+        LIMIT :limit
+    """)
+    rows = await db.execute(statement, {"match": match, "trainer_id": trainer_id, "limit": limit})
+    return [dict(row._mapping, rank=round(row.rank, 4)) for row in rows]
@@ -0,0 +1,102 @@
+"""
+Jinja2 environments with a persistent bytecode cache, and streamed rendering for large pages
+
+Compiled templates are kept under TEMPLATE_CACHE_DIR, so a fresh worker only
+unmarshals them instead of parsing and compiling every template again. Build
+the cache ahead of a deploy with `python templating.py`. Pages whose size grows
+with the data, like the trainer roster, render through an async overlay of the
+same environment and are sent as they are produced.
+"""
+import logging
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = "templates"
+# Rendered fragments are sent in chunks of about this size; the first, smaller one
+# carries the page head out before any row is read, whatever the roster size
+FIRST_CHUNK_BYTES = 1024
+STREAM_CHUNK_BYTES = 16 * 1024
+
+
+class _BytecodeCache(FileSystemBytecodeCache):
+    """Creates its directory on the first write, so building the environment touches no files"""
+
+    def dump_bytecode(self, bucket) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+
+def _bytecode_cache(pattern: str) -> Optional[FileSystemBytecodeCache]:
+    if not settings.TEMPLATE_CACHE_DIR:
+        return None
+    return _BytecodeCache(settings.TEMPLATE_CACHE_DIR, pattern)
+
+
+def create_templates(directory: str = TEMPLATE_DIR) -> Jinja2Templates:
+    environment = Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=True,
+        auto_reload=settings.TEMPLATE_AUTO_RELOAD,
+        bytecode_cache=_bytecode_cache("__jinja2_%s.cache"),
+    )
+    return Jinja2Templates(env=environment)
+
+
+# Async compiled code differs from sync code for the same source, so it gets its own cache files
+def create_streaming_environment(environment: Environment) -> Environment:
+    return environment.overlay(enable_async=True, bytecode_cache=_bytecode_cache("__jinja2_async_%s.cache"))
+
+
+# Load every template into both environments, compiling into the bytecode cache what is not there yet
+def warm_templates(*environments: Environment) -> int:
+    started = time.perf_counter()
+    names = environments[0].list_templates(extensions=["html"])
+    for environment in environments:
+        for name in names:
+            environment.get_template(name)
+    logger.info("Loaded %d templates in %.3fs", len(names), time.perf_counter() - started)
+    return len(names)
+
+
+# Join the many small rendered fragments into fewer, larger writes
+async def _chunked(fragments: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    buffer = []
+    size = 0
+    limit = FIRST_CHUNK_BYTES
+    async for fragment in fragments:
+        buffer.append(fragment)
+        size += len(fragment)
+        if size >= limit:
+            yield "".join(buffer).encode()
+            buffer = []
+            size = 0
+            limit = STREAM_CHUNK_BYTES
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+# Render a template from an async environment into a response as it is produced;
+# async iterables in the context are consumed by the template's loops
+def stream_template(environment: Environment, name: str, context: dict, status_code: int = 200, headers=None) -> StreamingResponse:
+    template = environment.get_template(name)
+    return StreamingResponse(
+        _chunked(template.generate_async(context)),
+        status_code=status_code,
+        media_type="text/html; charset=utf-8",
+        headers=headers,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    templates = create_templates()
+    warm_templates(templates.env, create_streaming_environment(templates.env))
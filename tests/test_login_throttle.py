@@ -0,0 +1,47 @@
+"""
+Login throttling regressions; run with `python -m pytest tests`
+"""
+import os
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="statsync-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'test.db')}"
+os.environ["ASSET_BUILD_DIR"] = os.path.join(WORKDIR, "assets")
+os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(WORKDIR, "templates")
+os.chdir(APP_DIR)
+sys.path.insert(0, APP_DIR)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import StatSync
+from throttle import TokenBucketLimiter, LoginThrottle, login_throttle
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(StatSync) as client:
+        yield client
+
+
+def test_admit_without_username_limits_only_the_address():
+    throttle = LoginThrottle(TokenBucketLimiter(1, 2, 10), TokenBucketLimiter(1, 1, 10), max_pending=1, busy_retry_after=1)
+    with throttle.admit("10.0.0.1", "athlete", None):
+        pass
+    with throttle.admit("10.0.0.1", "athlete", "  "):
+        pass
+    assert len(throttle.by_address) == 1
+    assert len(throttle.by_username) == 0
+
+
+@pytest.mark.parametrize("path", ["/login", "/trainer/login"])
+def test_login_without_username_is_invalid_credentials(client, path):
+    admitted = login_throttle.admitted
+    response = client.post(path, data={"password": "Passw0rd!"}, follow_redirects=False)
+    # The "Invalid credentials" login page again, not a 500 or a session
+    assert response.status_code == 200
+    assert "<form" in response.text
+    assert "access_token" not in response.headers.get("set-cookie", "")
+    assert login_throttle.admitted == admitted + 1
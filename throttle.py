@@ -0,0 +1,148 @@
+"""
+Login throttling: token buckets per client address and per username, and a cap on pending password checks
+
+Every bcrypt verification costs a worker thread a few hundred milliseconds of
+CPU, so login attempts are admitted before the password is looked at. A client
+address or an account that runs out of tokens, or a worker that already has
+LOGIN_MAX_PENDING_VERIFICATIONS checks queued or running, gets 429 with a
+Retry-After instead of another bcrypt round. State is per worker process and
+bounded: the least recently seen keys are evicted first.
+"""
+import math
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Hashable, Iterator, List, Optional
+
+from config import settings
+from metrics import register_collector
+
+
+class LoginThrottled(Exception):
+    """A login attempt was refused before its password was checked"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Login throttled ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket per key: up to `burst` attempts at once, refilled at `rate` per second
+    Only the max_keys most recently used buckets are kept; an evicted key starts full again
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> (tokens left, when they were counted)
+        self._buckets: "OrderedDict[Hashable, tuple[float, float]]" = OrderedDict()
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        entry = self._buckets.get(key)
+        if entry is None:
+            return float(self.burst)
+        tokens, counted_at = entry
+        return min(float(self.burst), tokens + (now - counted_at) * self.rate)
+
+    # Seconds until the key has a token to spend; 0 when it has one now
+    def retry_after(self, key: Hashable, now: Optional[float] = None) -> float:
+        tokens = self._tokens(key, time.monotonic() if now is None else now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, key: Hashable, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        self._buckets[key] = (self._tokens(key, now) - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class LoginThrottle:
+    """Admission control for password logins in this worker"""
+
+    def __init__(self, by_address: TokenBucketLimiter, by_username: TokenBucketLimiter, max_pending: int, busy_retry_after: int):
+        self.by_address = by_address
+        self.by_username = by_username
+        self.max_pending = max_pending
+        self.busy_retry_after = busy_retry_after
+        self.pending = 0
+        self.admitted = 0
+        self.refused = {"address": 0, "username": 0, "busy": 0}
+
+    def _refuse(self, reason: str, retry_after: float) -> LoginThrottled:
+        self.refused[reason] += 1
+        return LoginThrottled(reason, max(1, math.ceil(retry_after)))
+
+    # Hold a verification slot for the body of the with block, or raise LoginThrottled.
+    # Runs on the event loop with no await between the checks and taking the slot,
+    # so concurrent requests cannot both take the last one. Refused attempts spend no tokens.
+    # A login without a username matches no account, so only its address is limited
+    @contextmanager
+    def admit(self, address: str, role: str, username: Optional[str]) -> Iterator[None]:
+        if self.pending >= self.max_pending:
+            raise self._refuse("busy", self.busy_retry_after)
+        now = time.monotonic()
+        name = (username or "").strip().lower()
+        account = (role, name) if name else None
+        wait = self.by_address.retry_after(address, now)
+        if wait:
+            raise self._refuse("address", wait)
+        wait = self.by_username.retry_after(account, now) if account else 0
+        if wait:
+            raise self._refuse("username", wait)
+        self.by_address.take(address, now)
+        if account:
+            self.by_username.take(account, now)
+
+        self.pending += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    def metrics(self) -> List[str]:
+        lines = [
+            "# HELP statsync_login_pending_verifications Login password checks queued or running",
+            "# TYPE statsync_login_pending_verifications gauge",
+            f"statsync_login_pending_verifications {self.pending}",
+            "# HELP statsync_login_admitted_total Login attempts whose password was checked",
+            "# TYPE statsync_login_admitted_total counter",
+            f"statsync_login_admitted_total {self.admitted}",
+            "# HELP statsync_login_throttled_total Login attempts answered 429, by the limit they hit",
+            "# TYPE statsync_login_throttled_total counter",
+        ]
+        lines.extend(f'statsync_login_throttled_total{{reason="{reason}"}} {count}' for reason, count in sorted(self.refused.items()))
+        lines.extend([
+            "# HELP statsync_login_throttle_keys Client addresses and usernames with a token bucket",
+            "# TYPE statsync_login_throttle_keys gauge",
+            f"statsync_login_throttle_keys {len(self.by_address) + len(self.by_username)}",
+        ])
+        return lines
+
+
+def create_login_throttle() -> LoginThrottle:
+    return LoginThrottle(
+        by_address=TokenBucketLimiter(
+            settings.LOGIN_ADDRESS_RATE_PER_MINUTE / 60, settings.LOGIN_ADDRESS_BURST, settings.LOGIN_THROTTLE_MAX_KEYS),
+        by_username=TokenBucketLimiter(
+            settings.LOGIN_USERNAME_RATE_PER_MINUTE / 60, settings.LOGIN_USERNAME_BURST, settings.LOGIN_THROTTLE_MAX_KEYS),
+        max_pending=settings.LOGIN_MAX_PENDING_VERIFICATIONS,
+        busy_retry_after=settings.LOGIN_BUSY_RETRY_AFTER_SECONDS,
+    )
+
+
+login_throttle = create_login_throttle()
+register_collector(login_throttle.metrics)
+
+
+# The address the connection came from; behind a proxy, run uvicorn with
+# --proxy-headers so this is the client's address rather than the proxy's
+def client_address(request) -> str:
+    return request.client.host if request.client else "unknown"